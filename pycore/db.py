@@ -1,15 +1,60 @@
 # from pycore.dbmode.sqlitedb import SQLiteDB
-from pycore.dbmode.sqlite import Sqlite
-from pycore.dbmode.mysql import MySQL
 # from pycore.dbmode.mysqldb import MySQLDB
-from pycore.globalvers import appenv,sysid,systoken
-from pycore.utils_linux import file
+import threading
+from pycore.globalvers import appenv
 # print("appenv",appenv)
 # sqlite = SQLiteDB(appenv)
 # mysql = MySQLDB(appenv)
 
-print("sysid",sysid)
-print("systoken",systoken)
-sqlite = Sqlite(appenv)
-mysql = MySQL(appenv)
-# mysql = MySQLDB(appenv)
\ No newline at end of file
+# Adapters are created on first attribute access (`from pycore.db import sqlite`
+# or `db.mysql`), so importing this module needs neither a database driver
+# nor an engine. Call warmup() to build them eagerly, e.g. at server start.
+
+
+def _create_sqlite():
+    from pycore.dbmode.sqlite import Sqlite
+    return Sqlite(appenv)
+
+
+def _create_mysql():
+    from pycore.dbmode.mysql import MySQL
+    return MySQL(appenv)
+
+
+_factories = {
+    "sqlite": _create_sqlite,
+    "mysql": _create_mysql,
+}
+_instances = {}
+_lock = threading.Lock()
+
+
+def get(name):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    if name not in _factories:
+        raise KeyError(f"Unknown db instance '{name}', expected one of {list(_factories)}.")
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = _factories[name]()
+            _instances[name] = instance
+            globals()[name] = instance
+    return instance
+
+
+def warmup(*names):
+    for name in names or _factories:
+        get(name)
+    return {name: _instances[name] for name in (names or _factories)}
+
+
+def is_loaded(name) -> bool:
+    return name in _instances
+
+
+def __getattr__(name):
+    if name in _factories:
+        return get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
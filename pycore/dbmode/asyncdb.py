@@ -0,0 +1,111 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+from pycore.base.base import Base
+
+
+class AsyncDB(Base):
+    """
+    asyncio facade over a synchronous dbmode adapter: calls run on pool_size
+    worker threads, each holding its own connection, so the event loop never waits on I/O.
+    """
+
+    def __init__(self, db, pool_size: int = 4, thread_name_prefix: str = "asyncdb"):
+        self.db = db
+        self.pool_size = max(1, int(pool_size))
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix=thread_name_prefix)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def run_in_transaction(self, func, *args, **kwargs):
+        # func(db, *args, **kwargs) runs on one worker inside a single transaction
+        def call():
+            with self.db.transaction():
+                return func(self.db, *args, **kwargs)
+        return await self.run(call)
+
+    async def insert_one(self, tabname: str, data: Dict, result_id: bool = True):
+        return await self.run(self.db.insert_one, tabname, data, result_id=result_id)
+
+    async def insert_many(self, tabname: str, data: List[Dict], result_id: bool = True):
+        return await self.run(self.db.insert_many, tabname, data, result_id=result_id)
+
+    async def update_one(self, tabname: str, data: Dict, conditions: Dict):
+        return await self.run(self.db.update_one, tabname, data, conditions)
+
+    async def update_many(self, tabname: str, data: List[Dict], conditions: Dict):
+        return await self.run(self.db.update_many, tabname, data, conditions)
+
+    async def upsert_many(self, tabname: str, data: List[Dict], key_fields: Union[str, List[str]],
+                          chunk_size: int = 500) -> Dict[str, int]:
+        return await self.run(self.db.upsert_many, tabname, data, key_fields, chunk_size=chunk_size)
+
+    async def read_one(self, tablename: str, conditions: Dict = None, select: str = "*",
+                       include_deleted: bool = False) -> Optional[Dict[str, Any]]:
+        return await self.run(self.db.read_one, tablename, conditions=conditions, select=select,
+                              include_deleted=include_deleted)
+
+    async def read_many(self, tablename: str, conditions: Dict = None, limit: Tuple[int, int] = (0, 1000),
+                        select: str = "*", sort: Dict[str, str] = None,
+                        include_deleted: bool = False) -> List[Dict[str, Any]]:
+        return await self.run(self.db.read_many, tablename, conditions=conditions, limit=limit, select=select,
+                              sort=sort, include_deleted=include_deleted)
+
+    async def delete(self, tabname: str, conditions: Dict = None, physical: bool = False):
+        return await self.run(self.db.delete, tabname, conditions=conditions, physical=physical)
+
+    async def purge_deleted(self, tablename: str, retention: float = 0, batch_size: int = 1000) -> int:
+        return await self.run(self.db.purge_deleted, tablename, retention=retention, batch_size=batch_size)
+
+    async def table_exists(self, tablename: str) -> bool:
+        return await self.run(self.db.table_exists, tablename)
+
+    async def iter_rows(self, tablename: str, conditions: Dict = None, batch_size: int = 1000, **kwargs):
+        rows = self.db.iter_rows(tablename, conditions=conditions, batch_size=batch_size, **kwargs)
+        try:
+            while True:
+                batch = await self.run(lambda: list(itertools.islice(rows, batch_size)))
+                for row in batch:
+                    yield row
+                if len(batch) < batch_size:
+                    return
+        finally:
+            rows.close()
+
+    async def close(self):
+        # both block until in-flight calls finish, so they wait on the loop's default executor
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self.executor.shutdown, wait=True))
+        await loop.run_in_executor(None, self.close_db)
+
+    def close_db(self):
+        self.db.close()
+
+
+class AsyncSqlite(AsyncDB):
+
+    def __init__(self, appenv_or_dburl, pool_size: int = 4, debug: bool = False, **kwargs):
+        from pycore.dbmode.sqlite import Sqlite
+        super().__init__(Sqlite(appenv_or_dburl, debug=debug, pool_size=pool_size, **kwargs), pool_size=pool_size,
+                         thread_name_prefix="async-sqlite")
+
+
+class AsyncMySQL(AsyncDB):
+
+    def __init__(self, config_or_dburl, pool_size: int = 5, debug: bool = False):
+        from pycore.dbmode.mysql import MySQL
+        super().__init__(MySQL(config_or_dburl, debug=debug), pool_size=pool_size, thread_name_prefix="async-mysql")
+
+    def close_db(self):
+        self.db.engine.dispose()
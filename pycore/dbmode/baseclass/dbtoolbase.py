@@ -1,12 +1,24 @@
+import functools
+import hashlib
 import json
 import os
-from typing import Dict, List, Union, Tuple
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from collections import namedtuple
+from inspect import signature as call_signature
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union, Tuple
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from pycore.globalvers import appenv, appdir
 from pycore.base.base import Base
 from pycore.utils_linux import file
+from pycore.dbmode.baseclass.query_cache import query_cache
+from pycore.dbmode.baseclass.result_cache import MemoryCacheBackend, RedisCacheBackend, ResultCache
+from pycore.dbmode.baseclass.metrics import DBMetrics
+from pycore.dbmode.baseclass import table_io
 from sqlalchemy.types import (
     BigInteger, Boolean, Date, DateTime, Enum, Float, Integer, Interval,
     LargeBinary, MatchType, Numeric, PickleType, SchemaType, SmallInteger, String,
@@ -18,6 +30,35 @@ from sqlalchemy import (
     REAL, SMALLINT, TEXT, TIME, TIMESTAMP, UUID, VARBINARY, VARCHAR,Enum as SQLAlchemyEnum
 )
 
+condition_prefixes = ((">=", ">="), ("<=", "<="), (">", ">"), ("<", "<"), ("!=", "!="))
+
+# Table maps may carry index declarations under this key, next to the columns:
+#   "__indexes__": ["word", ["word", "word_sort"], {"columns": ["word"], "unique": True, "name": "uq_word"}]
+# A column can also declare "index": True or "unique": True in its own info dict.
+indexes_key = "__indexes__"
+# SQLite only: full-text mirror of the table, see Sqlite.create_fts
+#   "__fts__": {"columns": ["word", "phonetic_us"], "tokenize": "unicode61", "prefix": [2, 3]}
+fts_key = "__fts__"
+table_map_keys = (indexes_key, fts_key)
+# Soft deletes set deleted = 1 (and deleted_time, when the table has it); reads skip those rows
+# unless include_deleted=True. Rows whose deleted is NULL (added to an existing table without a
+# default) count as live. An index declared with "live": True only covers live rows.
+deleted_column = "deleted"
+deleted_time_column = "deleted_time"
+live_condition = f"({deleted_column} = 0 OR {deleted_column} IS NULL)"
+
+
+class _LiveRows:
+    # the value live_conditions puts under `deleted`: compiles to live_condition, binds nothing
+    def __repr__(self):
+        return "live_rows"
+
+
+live_rows = _LiveRows()
+where_column_pattern = re.compile(r"\b(\w+)\s*(?:=|!=|<>|<=|>=|<|>|\bLIKE\b|\bIN\b)", re.IGNORECASE)
+where_clause_pattern = re.compile(r"\bWHERE\b(.*?)(?:\bORDER\s+BY\b|\bGROUP\s+BY\b|\bLIMIT\b|$)",
+                                  re.IGNORECASE | re.DOTALL)
+
 sqlite_type_mapping = {
     'INT': INTEGER,
     'INTEGER': INTEGER,
@@ -110,7 +151,46 @@ def _get_column_type(self, col_type: str, db_type: str):
         raise ValueError(f"Unsupported database type: {db_type}")
 
 
+def _cache_part(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _cache_part(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_part(item) for item in value)
+    return value
+
+
+def cached_read(method):
+    # Serve a read from the adapter's result cache, if enabled. The key is the
+    # normalized call: table, conditions, select, sort, limit, ...
+    signature = call_signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, tablename, *args, **kwargs):
+        if self.result_cache is None or self.in_transaction():
+            return method(self, tablename, *args, **kwargs)
+        bound = signature.bind(self, tablename, *args, **kwargs)
+        bound.apply_defaults()
+        parts = (method.__name__,) + tuple((name, _cache_part(value)) for name, value in bound.arguments.items()
+                                           if name not in ("self", "tablename", "print_sql"))
+        return self.result_cache.get_or_load(tablename, parts,
+                                             lambda: method(self, tablename, *args, **kwargs))
+    return wrapper
+
+
+def invalidates_cache(method):
+    @functools.wraps(method)
+    def wrapper(self, tabname, *args, **kwargs):
+        try:
+            return method(self, tabname, *args, **kwargs)
+        finally:
+            self.invalidate_result_cache(tabname)
+    return wrapper
+
+
 class DBToolBase(Base):
+    result_cache = None
+    slow_query_ms = None
+    metrics = None
 
     def migrate_data(self, origin_db,target_db: any):
         table_maps = origin_db.get_tablemaps()
@@ -126,6 +206,308 @@ class DBToolBase(Base):
             if origin_data:
                 target_db.insert_many(table_name, origin_data)
 
+    def enable_result_cache(self, backend=None, maxsize: int = 1024, ttl: float = 60.0) -> ResultCache:
+        """
+        backend: None for an in-process LRU of maxsize entries, a pycore Redis adapter /
+        redis client to share entries between workers, or any object with the
+        MemoryCacheBackend interface.
+        """
+        if backend is None:
+            backend = MemoryCacheBackend(maxsize)
+        elif not hasattr(backend, "lookup"):
+            backend = RedisCacheBackend(backend)
+        namespace = f"dbcache:{hashlib.sha1(str(self.db_url).encode('utf-8')).hexdigest()[:12]}"
+        self.result_cache = ResultCache(backend, ttl=ttl, namespace=namespace)
+        return self.result_cache
+
+    def enable_metrics(self, *sinks, slow_query_ms: Optional[float] = None) -> DBMetrics:
+        """
+        Record statement latency, rows read/written and connection acquire/pool wait to sinks
+        (MemorySink, PrometheusSink, LogSink; default a MemorySink). slow_query_ms is the same
+        threshold as set_slow_query_log(): check_slow_query() passes each slow statement to the
+        sinks' slow-query log, so there is one threshold and one report per statement.
+        """
+        if slow_query_ms is not None:
+            self.set_slow_query_log(slow_query_ms)
+        self.metrics = DBMetrics(type(self).__name__.lower(), sinks)
+        self._attach_metrics()
+        return self.metrics
+
+    def disable_metrics(self):
+        self.metrics = None
+        self._attach_metrics()
+
+    def _attach_metrics(self):
+        pass
+
+    def record_rows_read(self, count: int):
+        if self.metrics is not None:
+            self.metrics.rows_read(count)
+
+    def disable_result_cache(self):
+        self.result_cache = None
+
+    def invalidate_result_cache(self, tabname: str):
+        if self.result_cache is None:
+            return
+        self.result_cache.invalidate(tabname)
+        if self.in_transaction():
+            # bump again on commit/rollback: readers may have cached the
+            # pre-commit rows in the meantime
+            dirty_tables = getattr(self._local, "dirty_tables", None)
+            if dirty_tables is None:
+                dirty_tables = self._local.dirty_tables = set()
+            dirty_tables.add(tabname)
+
+    def flush_dirty_tables(self):
+        dirty_tables = getattr(self._local, "dirty_tables", None)
+        if not dirty_tables:
+            return
+        self._local.dirty_tables = None
+        if self.result_cache is not None:
+            for tabname in dirty_tables:
+                self.result_cache.invalidate(tabname)
+
+    def table_fields(self, fields: Dict) -> Dict:
+        return {name: info for name, info in fields.items() if name not in table_map_keys}
+
+    def index_declarations(self, tablename: str, fields: Dict) -> List[Dict[str, Any]]:
+        declared = []
+        for name, info in self.table_fields(fields).items():
+            if isinstance(info, dict) and not info.get("primary_key"):
+                if info.get("unique"):
+                    declared.append({"columns": [name], "unique": True})
+                elif info.get("index"):
+                    declared.append({"columns": [name]})
+        for index in fields.get(indexes_key, []):
+            if isinstance(index, str):
+                index = {"columns": [index]}
+            elif isinstance(index, (list, tuple)):
+                index = {"columns": list(index)}
+            declared.append(index)
+        indexes = []
+        for index in declared:
+            columns = tuple(index["columns"])
+            unique = bool(index.get("unique", False))
+            column_names = "_".join(self.index_column_name(column) for column in columns)
+            name = index.get("name") or f"{'uq' if unique else 'idx'}_{tablename}_{column_names}"
+            where = index.get("where") or (live_condition if index.get("live") else None)
+            indexes.append({"name": name, "columns": columns, "unique": unique, "where": where})
+        return indexes
+
+    def index_column_name(self, column: str) -> str:
+        # "word(64)" / "word DESC" -> "word"
+        return re.split(r"[\s(]", column.strip(), 1)[0]
+
+    def ensure_indexes(self, tablename: str, fields: Dict) -> List[str]:
+        """
+        Create the declared indexes that are missing; an index whose name exists with
+        different columns/uniqueness is rebuilt. Returns the names of indexes created.
+        """
+        existing = self.get_indexes(tablename)
+        created = []
+        for index in self.index_declarations(tablename, fields):
+            current = existing.get(index["name"])
+            if current is not None:
+                if self.index_matches(current, index):
+                    continue
+                self.drop_index(tablename, index["name"])
+            elif any(self.index_matches(other, index) for other in existing.values()):
+                continue
+            self.create_index(tablename, index)
+            created.append(index["name"])
+        if created:
+            self.info(f"Table '{tablename}': created indexes {', '.join(created)}.")
+        return created
+
+    def index_matches(self, current: Dict[str, Any], index: Dict[str, Any]) -> bool:
+        columns = tuple(self.index_column_name(column) for column in index["columns"])
+        return (current["columns"] == columns and current["unique"] == index["unique"]
+                and current.get("partial", False) == bool(index.get("where")))
+
+    def has_tombstones(self, tablename: str) -> bool:
+        return deleted_column in self.get_table(tablename)
+
+    def live_conditions(self, tablename: str, conditions: Dict = None, include_deleted: bool = False) -> Dict:
+        # an explicit "deleted" condition always wins
+        conditions = conditions or {}
+        if include_deleted or deleted_column in conditions or not self.has_tombstones(tablename):
+            return conditions
+        return {**conditions, deleted_column: live_rows}
+
+    def has_deleted_time(self, tablename: str) -> bool:
+        return deleted_time_column in self.get_table(tablename)
+
+    def tombstone_values(self, tablename: str) -> Dict[str, Any]:
+        values = {deleted_column: 1}
+        if self.has_deleted_time(tablename):
+            values[deleted_time_column] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return values
+
+    def purge_deleted(self, tablename: str, retention: float = 0, batch_size: int = 1000,
+                      compact_threshold: int = 10000) -> int:
+        """
+        Physically delete tombstoned rows in batches of batch_size. With retention (seconds) > 0
+        only rows whose deleted_time is older are purged, which needs a deleted_time column.
+        Compacts the table (VACUUM / OPTIMIZE TABLE) once compact_threshold rows are gone.
+        """
+        if not self.has_tombstones(tablename):
+            return 0
+        cutoff = None
+        if retention:
+            if not self.has_deleted_time(tablename):
+                self.warn(f"purge_deleted {tablename}: retention needs a '{deleted_time_column}' column, skipped.")
+                return 0
+            cutoff = (datetime.now() - timedelta(seconds=retention)).strftime("%Y-%m-%d %H:%M:%S")
+        purged = 0
+        while True:
+            count = self._purge_batch(tablename, cutoff, batch_size)
+            purged += count
+            if count < batch_size:
+                break
+        if purged:
+            self.invalidate_result_cache(tablename)
+            self.info(f"purge_deleted {tablename}: {purged} rows removed")
+        if compact_threshold is not None and purged >= compact_threshold:
+            self.compact(tablename)
+        return purged
+
+    def start_purge_job(self, tables: List[str] = None, interval: float = 3600, retention: float = 0,
+                        batch_size: int = 1000, compact_threshold: int = 10000) -> threading.Thread:
+        """Run purge_deleted over tables (default: every table with a deleted column) every interval seconds."""
+        self.stop_purge_job()
+        stop = self._purge_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                for tablename in tables or [table for table in self.get_tablemaps() if self.has_tombstones(table)]:
+                    if stop.is_set():
+                        return
+                    try:
+                        self.purge_deleted(tablename, retention=retention, batch_size=batch_size,
+                                           compact_threshold=compact_threshold)
+                    except Exception as e:
+                        self.warn(f"purge job: {tablename} failed: {e}")
+
+        self._purge_thread = threading.Thread(target=run, name="db-purge", daemon=True)
+        self._purge_thread.start()
+        return self._purge_thread
+
+    def stop_purge_job(self, timeout: float = None):
+        stop = getattr(self, "_purge_stop", None)
+        if stop is None:
+            return
+        stop.set()
+        self._purge_thread.join(timeout)
+        self._purge_stop = None
+
+    def set_slow_query_log(self, threshold_ms: Optional[float] = 100):
+        """Log statements slower than threshold_ms with their query plan and index hints; None turns it off."""
+        self.slow_query_ms = threshold_ms
+
+    def check_slow_query(self, sql: str, params: Any, started: float, many: bool = False):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self.slow_query_ms is None or elapsed_ms < self.slow_query_ms:
+            return
+        if self.metrics is not None:
+            self.metrics.slow_query(sql, elapsed_ms / 1000)
+        self.warn(f"slow query {elapsed_ms:.1f}ms: {sql}")
+        # executemany params are a list of rows, which EXPLAIN cannot take
+        if many or sql.lstrip()[:6].upper() not in ("SELECT", "UPDATE", "DELETE"):
+            return
+        try:
+            plan = self.explain(sql, params)
+        except Exception as e:
+            self.warn(f"\texplain failed: {e}")
+            return
+        for line in plan:
+            self.warn(f"\tplan: {line}")
+        for suggestion in self.suggest_indexes(sql, plan):
+            self.warn(f"\tsuggest: {suggestion}")
+
+    def where_columns(self, sql: str) -> List[str]:
+        match = where_clause_pattern.search(sql)
+        if not match:
+            return []
+        columns = []
+        for column in where_column_pattern.findall(match.group(1)):
+            if column.upper() not in ("AND", "OR", "NOT") and column not in columns:
+                columns.append(column)
+        return columns
+
+    def suggest_indexes(self, sql: str, plan: List[Any]) -> List[str]:
+        columns = self.where_columns(sql)
+        if not columns:
+            return []
+        suggestions = []
+        for tablename in self.plan_scans(plan):
+            indexed = [index["columns"] for index in self.get_indexes(tablename).values()]
+            if any(index[:len(columns)] == tuple(columns) for index in indexed):
+                continue
+            name = f"idx_{tablename}_{'_'.join(columns)}"
+            suggestions.append(f"CREATE INDEX {name} ON {tablename} ({', '.join(columns)})"
+                               f" -- or declare it under \"{indexes_key}\" in the table map")
+        return suggestions
+
+    def export_table(self, tablename: str, path: str, format: str = None, conditions: Dict = None,
+                     batch_size: int = 10000, key: str = None, include_deleted: bool = True) -> int:
+        """
+        Stream a table to NDJSON or CSV (gzip when path ends in .gz), or to Parquet when
+        pyarrow is installed. format defaults to the path's extension. Returns rows written.
+        """
+        format = table_io.detect_format(path, format)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        rows = self.iter_rows(tablename, conditions=conditions, batch_size=batch_size, key=key,
+                              include_deleted=include_deleted)
+        written = table_io.write_rows(path, format, self._row_chunks(rows, batch_size))
+        self.info(f"export_table {tablename}: {written} rows -> {path}")
+        return written
+
+    def import_table(self, tablename: str, path: str, format: str = None, batch_size: int = 5000) -> int:
+        """Load a file written by export_table through insert_many, one chunk at a time."""
+        format = table_io.detect_format(path, format)
+        imported = 0
+        for chunk in table_io.read_rows(path, format, batch_size):
+            self.insert_many(tablename, chunk, result_id=False)
+            imported += len(chunk)
+        self.info(f"import_table {tablename}: {imported} rows <- {path}")
+        return imported
+
+    def _row_chunks(self, rows: Iterable[Dict], batch_size: int):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def row_builder(self, columns: List[str], row_type: str = "dict", name: str = "Row") -> Callable:
+        if row_type == "dict":
+            return lambda row: dict(zip(columns, row))
+        if row_type == "tuple":
+            return tuple
+        if row_type == "row":
+            return namedtuple(f"{name}_row", columns, rename=True)._make
+        raise ValueError(f"Unsupported row_type: {row_type}, expected 'dict', 'tuple' or 'row'.")
+
+    def chunked(self, rows: List[Any], chunk_size: int):
+        chunk_size = max(1, int(chunk_size))
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+    def upsert_counts(self, rows: List[Dict], key_fields: List[str], existing: Iterable[Tuple]) -> Tuple[int, int]:
+        seen = set(existing)
+        inserted = 0
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            if key not in seen:
+                seen.add(key)
+                inserted += 1
+        return inserted, len(rows) - inserted
+
     def get_db_url_from_config_sqlite(self, appenv_or_dburl):
         if isinstance(appenv_or_dburl, str):
             return appenv_or_dburl
@@ -149,72 +531,55 @@ class DBToolBase(Base):
         return db_url
 
 
-    def build_conditions_mysql(self, conditions: Dict[str, str]) -> Tuple[str, Tuple]:
-        if not conditions:
-            return "", ()
-        clauses = []
-        values = []
+    def condition_shape(self, conditions: Dict[str, Any]) -> Tuple[Tuple[str, str, int], ...]:
+        # (column, operator, prefix length to strip from the value); values
+        # like '%a', 'a%' and '%a%' are already valid LIKE patterns.
+        shape = []
         for key, val in conditions.items():
-            if val.startswith(">="):
-                clauses.append(f"{key} >= %s")
-                values.append(val[2:])
-            elif val.startswith("<="):
-                clauses.append(f"{key} <= %s")
-                values.append(val[2:])
-            elif val.startswith(">"):
-                clauses.append(f"{key} > %s")
-                values.append(val[1:])
-            elif val.startswith("<"):
-                clauses.append(f"{key} < %s")
-                values.append(val[1:])
-            elif val.startswith("!="):
-                clauses.append(f"{key} != %s")
-                values.append(val[2:])
-            elif val.startswith("%") and val.endswith("%"):
-                clauses.append(f"{key} LIKE %s")
-                values.append(val)
-            elif val.startswith("%"):
-                clauses.append(f"{key} LIKE %s")
-                values.append(f"%{val[1:]}")
-            elif val.endswith("%"):
-                clauses.append(f"{key} LIKE %s")
-                values.append(f"{val[:-1]}%")
-            else:
-                clauses.append(f"{key} = %s")
-                values.append(val)
-        return " AND ".join(clauses), tuple(values)
+            operator, strip = "=", 0
+            if val is live_rows:
+                operator = "LIVE"
+            elif isinstance(val, str):
+                for prefix, prefix_operator in condition_prefixes:
+                    if val.startswith(prefix):
+                        operator, strip = prefix_operator, len(prefix)
+                        break
+                else:
+                    if val.startswith("%") or val.endswith("%"):
+                        operator = "LIKE"
+            shape.append((key, operator, strip))
+        return tuple(shape)
+
+    def condition_values(self, conditions: Dict[str, Any], shape: Tuple) -> Tuple:
+        return tuple(val[strip:] if strip else val for (_, operator, strip), val in zip(shape, conditions.values())
+                     if operator != "LIVE")
+
+    def compile_conditions(self, shape: Tuple, dialect: str) -> str:
+        # the live condition is inlined verbatim so SQLite can match it to a live partial index
+        def term(key, operator, placeholder):
+            return live_condition if operator == "LIVE" else f"{key} {operator} {placeholder}"
+        if dialect == "sqlite":
+            build = lambda: " AND ".join([term(key, operator, "?") for key, operator, _ in shape])
+        else:
+            build = lambda: " AND ".join([term(key, operator, f":w_{key}") for key, operator, _ in shape])
+        return query_cache.get_or_build((dialect, "where", shape), build)
+
+    def cached_sql(self, key: Tuple, build: Callable[[], str]) -> str:
+        return query_cache.get_or_build(key, build)
+
+    def sort_clause(self, sort: Dict[str, str] = None) -> str:
+        return ' ORDER BY ' + ', '.join([f"{key} {value}" for key, value in sort.items()]) if sort else ''
+
+    def build_conditions_mysql(self, conditions: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        if not conditions:
+            return "", {}
+        shape = self.condition_shape(conditions)
+        values = self.condition_values(conditions, shape)
+        keys = [key for key, operator, _ in shape if operator != "LIVE"]
+        return self.compile_conditions(shape, "mysql"), {f"w_{key}": val for key, val in zip(keys, values)}
 
     def build_conditions_sqlite(self, conditions: Dict[str, str]) -> Tuple[str, Tuple]:
         if not conditions:
             return "", ()
-        clauses = []
-        values = []
-        for key, val in conditions.items():
-            if val.startswith(">="):
-                clauses.append(f"{key} >= ?")
-                values.append(val[2:])
-            elif val.startswith("<="):
-                clauses.append(f"{key} <= ?")
-                values.append(val[2:])
-            elif val.startswith(">"):
-                clauses.append(f"{key} > ?")
-                values.append(val[1:])
-            elif val.startswith("<"):
-                clauses.append(f"{key} < ?")
-                values.append(val[1:])
-            elif val.startswith("!="):
-                clauses.append(f"{key} != ?")
-                values.append(val[2:])
-            elif val.startswith("%") and val.endswith("%"):
-                clauses.append(f"{key} LIKE ?")
-                values.append(val)
-            elif val.startswith("%"):
-                clauses.append(f"{key} LIKE ?")
-                values.append(f"%{val[1:]}")
-            elif val.endswith("%"):
-                clauses.append(f"{key} LIKE ?")
-                values.append(f"{val[:-1]}%")
-            else:
-                clauses.append(f"{key} = ?")
-                values.append(val)
-        return " AND ".join(clauses), tuple(values)
\ No newline at end of file
+        shape = self.condition_shape(conditions)
+        return self.compile_conditions(shape, "sqlite"), self.condition_values(conditions, shape)
@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pycore.base.log import log
+
+default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+metric_help = {
+    "db_statements_total": "Statements executed.",
+    "db_statement_errors_total": "Statements that raised.",
+    "db_rows_read_total": "Rows returned to the caller.",
+    "db_rows_written_total": "Rows inserted, updated or deleted.",
+    "db_slow_queries_total": "Statements slower than the slow-query threshold.",
+    "db_statement_seconds": "Statement latency.",
+    "db_acquire_seconds": "Time to get a connection, including any pool wait.",
+    "db_pool_wait_seconds": "Time blocked waiting for a free pooled connection.",
+}
+read_operations = ("select", "pragma", "show", "explain", "with", "find", "aggregate", "count", "distinct")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MemorySink:
+    """Aggregates counters and histograms in process; snapshot() returns a plain-dict copy."""
+
+    def __init__(self, buckets: Iterable[float] = default_buckets, slow_queries: int = 100):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._slow_queries = deque(maxlen=slow_queries)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, labels: Labels, amount: float = 1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, labels: Labels, value: float):
+        with self._lock:
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # one count per bucket, then +Inf, sum
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[position] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += value
+
+    def slow_query(self, labels: Labels, statement: str, seconds: float):
+        with self._lock:
+            self._slow_queries.append({"time": time.time(), "seconds": seconds, "statement": statement,
+                                       **dict(labels)})
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, {})[self._label_text(labels)] = value
+            histograms = {}
+            for (name, labels), histogram in self._histograms.items():
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + (float("inf"),), histogram[:-1]):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                histograms.setdefault(name, {})[self._label_text(labels)] = {
+                    "count": cumulative, "sum": histogram[-1], "buckets": buckets}
+            return {"counters": counters, "histograms": histograms, "slow_queries": list(self._slow_queries)}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._slow_queries.clear()
+
+    def _label_text(self, labels: Labels) -> str:
+        return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+class PrometheusSink(MemorySink):
+    """MemorySink rendered in the Prometheus text format; serve() exposes it on /metrics."""
+
+    def __init__(self, buckets: Iterable[float] = default_buckets):
+        super().__init__(buckets)
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def render(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in snapshot["counters"].items():
+            lines.append(f"# HELP {name} {metric_help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{{{labels}}} {value}" for labels, value in series.items())
+        for name, series in snapshot["histograms"].items():
+            lines.append(f"# HELP {name} {metric_help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                separator = "," if labels else ""
+                for bound, count in histogram["buckets"].items():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram['sum']}")
+                lines.append(f"{name}_count{{{labels}}} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        sink = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, name="db-metrics-http", daemon=True).start()
+        return self.server
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class LogSink:
+    """Writes slow queries (and, with statements=True, every statement) to a log file."""
+
+    def __init__(self, log_filename: str = "db_metrics", statements: bool = False):
+        self.log_filename = log_filename
+        self.statements = statements
+
+    def increment(self, name: str, labels: Labels, amount: float = 1):
+        pass
+
+    def observe(self, name: str, labels: Labels, value: float):
+        if self.statements and name == "db_statement_seconds":
+            log.easy_log(f"{dict(labels)} {value * 1000:.2f}ms", "info", self.log_filename)
+
+    def slow_query(self, labels: Labels, statement: str, seconds: float):
+        log.easy_log(f"slow query {seconds * 1000:.1f}ms {dict(labels)}: {statement}", "warn", self.log_filename)
+
+
+class DBMetrics:
+    """
+    Per-adapter recorder that fans measurements out to its sinks. slow_query_ms is
+    only for adapters without a slow-query log of their own; SQL adapters leave it
+    None and report through slow_query() from check_slow_query().
+    """
+
+    def __init__(self, adapter: str, sinks: Iterable = (), slow_query_ms: Optional[float] = None):
+        self.adapter = adapter
+        self.sinks = list(sinks) or [MemorySink()]
+        self.slow_query_ms = slow_query_ms
+
+    def operation(self, statement: str) -> str:
+        words = statement.lstrip().split(None, 1)
+        return words[0].lower() if words else "unknown"
+
+    def statement(self, statement: str, seconds: float, rows: int = -1, error: bool = False,
+                  operation: str = None):
+        operation = operation or self.operation(statement)
+        labels = (("adapter", self.adapter), ("op", operation))
+        for sink in self.sinks:
+            sink.increment("db_statements_total", labels)
+            sink.observe("db_statement_seconds", labels, seconds)
+            if error:
+                sink.increment("db_statement_errors_total", labels)
+            if rows is not None and rows > 0:
+                kind = "db_rows_read_total" if operation in read_operations else "db_rows_written_total"
+                sink.increment(kind, labels, rows)
+        if self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            self.slow_query(statement, seconds, operation)
+
+    def slow_query(self, statement: str, seconds: float, operation: str = None):
+        labels = (("adapter", self.adapter), ("op", operation or self.operation(statement)))
+        for sink in self.sinks:
+            sink.increment("db_slow_queries_total", labels)
+            sink.slow_query(labels, statement, seconds)
+
+    def rows_read(self, count: int, operation: str = "select"):
+        if count:
+            labels = (("adapter", self.adapter), ("op", operation))
+            for sink in self.sinks:
+                sink.increment("db_rows_read_total", labels, count)
+
+    def acquire(self, seconds: float):
+        self._observe("db_acquire_seconds", seconds)
+
+    def pool_wait(self, seconds: float):
+        self._observe("db_pool_wait_seconds", seconds)
+
+    def _observe(self, name: str, seconds: float):
+        labels = (("adapter", self.adapter),)
+        for sink in self.sinks:
+            sink.observe(name, labels, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        for sink in self.sinks:
+            if hasattr(sink, "snapshot"):
+                return sink.snapshot()
+        return {}
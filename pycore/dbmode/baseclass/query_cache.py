@@ -0,0 +1,40 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class QueryCache:
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], str]) -> str:
+        with self._lock:
+            sql = self._data.get(key)
+            if sql is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return sql
+        sql = build()
+        with self._lock:
+            self.misses += 1
+            self._data[key] = sql
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return sql
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+query_cache = QueryCache()
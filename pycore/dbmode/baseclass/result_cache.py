@@ -0,0 +1,129 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class MemoryCacheBackend:
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, gen_key: str, key: str) -> Tuple[int, Optional[Tuple]]:
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get(gen_key, 0)
+            item = self._data.get(key)
+            if item is None:
+                return generation, None
+            expires_at, entry = item
+            if expires_at < now:
+                del self._data[key]
+                return generation, None
+            self._data.move_to_end(key)
+            return generation, entry
+
+    def store(self, key: str, entry: Tuple, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, entry)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def bump(self, gen_key: str):
+        with self._lock:
+            self._generations[gen_key] = self._generations.get(gen_key, 0) + 1
+
+    def clear(self, namespace: str):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCacheBackend:
+    """
+    Shares cached results between workers. Entries expire by TTL; the size
+    bound is the server's maxmemory-policy (allkeys-lru recommended).
+    """
+
+    def __init__(self, redis_db):
+        # a pycore Redis adapter or a plain redis-py client
+        self.con = redis_db.connect() if hasattr(redis_db, "connect") else redis_db
+
+    def lookup(self, gen_key: str, key: str) -> Tuple[int, Optional[Tuple]]:
+        generation, raw = self.con.mget(gen_key, key)
+        return int(generation or 0), pickle.loads(raw) if raw else None
+
+    def store(self, key: str, entry: Tuple, ttl: float):
+        self.con.set(key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), px=max(1, int(ttl * 1000)))
+
+    def bump(self, gen_key: str):
+        self.con.incr(gen_key)
+
+    def clear(self, namespace: str):
+        keys = []
+        for key in self.con.scan_iter(match=f"{namespace}:*", count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                self.con.delete(*keys)
+                keys = []
+        if keys:
+            self.con.delete(*keys)
+
+
+class ResultCache:
+    """
+    Read-result cache with per-table generations: a write bumps the table's
+    generation, and entries stored under an older generation are treated as misses.
+    """
+
+    def __init__(self, backend=None, ttl: float = 60.0, namespace: str = "dbcache"):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def _gen_key(self, tablename: str) -> str:
+        return f"{self.namespace}:{tablename}:__gen"
+
+    def _key(self, tablename: str, parts: Hashable) -> str:
+        digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{tablename}:{digest}"
+
+    def get_or_load(self, tablename: str, parts: Hashable, load: Callable[[], Any]) -> Any:
+        key = self._key(tablename, parts)
+        generation, entry = self.backend.lookup(self._gen_key(tablename), key)
+        if entry is not None and entry[0] == generation:
+            self.hits += 1
+            return self._copy(entry[1])
+        self.misses += 1
+        value = load()
+        # stored under the generation read *before* loading, so a write that
+        # lands while we load makes this entry stale instead of serving it
+        self.backend.store(key, (generation, value), self.ttl)
+        return self._copy(value)
+
+    def invalidate(self, tablename: str):
+        self.backend.bump(self._gen_key(tablename))
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+        self.hits = 0
+        self.misses = 0
+
+    def _copy(self, value: Any) -> Any:
+        # callers often mutate the returned rows; never hand out the cached objects
+        if isinstance(value, list):
+            return [dict(row) if isinstance(row, dict) else row for row in value]
+        if isinstance(value, dict):
+            return dict(value)
+        return value
@@ -0,0 +1,94 @@
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from pycore.base.base import Base
+
+default_pragmas = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+}
+
+
+class SqlitePool(Base):
+
+    def __init__(self, db_url: str, pool_size: int = 5, cached_statements: int = 256, timeout: float = 30.0,
+                 pragmas: Dict[str, str] = None):
+        self.db_url = db_url
+        self.pool_size = max(1, int(pool_size))
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.pragmas = dict(default_pragmas if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._closed = False
+        # called with the seconds spent waiting for a free slot, see Sqlite.enable_metrics
+        self.wait_observer = None
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_url, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for key, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {key} = {value}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot acquire a connection from a closed pool.")
+        wait = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        acquired = self._slots.acquire(timeout=wait)
+        if self.wait_observer is not None:
+            self.wait_observer(time.perf_counter() - started)
+        if not acquired:
+            raise TimeoutError(f"No idle sqlite connection within {wait}s (pool_size={self.pool_size}).")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        if conn is None:
+            return
+        if self._closed:
+            conn.close()
+            self._slots.release()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    def size(self) -> int:
+        return len(self._connections)
+
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
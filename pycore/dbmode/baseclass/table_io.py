@@ -0,0 +1,144 @@
+import base64
+import csv
+import datetime
+import decimal
+import gzip
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List
+
+table_formats = ("ndjson", "csv", "parquet")
+csv_null = "\\N"
+# CSV has no binary type: bytes are written as \x<hex> (PostgreSQL bytea style)
+csv_bytes_pattern = re.compile(r"\\x([0-9a-f]*)")
+
+
+def detect_format(path: str, format: str = None) -> str:
+    if format:
+        if format not in table_formats:
+            raise ValueError(f"Unsupported table format: {format}, expected one of {table_formats}.")
+        return format
+    name = path[:-3] if path.endswith(".gz") else path
+    for candidate, suffixes in (("ndjson", (".ndjson", ".jsonl", ".json")), ("csv", (".csv",)),
+                                ("parquet", (".parquet",))):
+        if name.endswith(suffixes):
+            return candidate
+    raise ValueError(f"Cannot tell the table format of '{path}', pass format=.")
+
+
+def open_text(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, f"{mode}t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export/import needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _json_default(value: Any):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"b64": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, dict) and "b64" in value:
+        return base64.b64decode(value["b64"])
+    return value
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return csv_null
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    return value
+
+
+def _csv_value(value: str) -> Any:
+    if value == csv_null:
+        return None
+    if value.startswith("\\x"):
+        match = csv_bytes_pattern.fullmatch(value)
+        if match:
+            return bytes.fromhex(match.group(1))
+    return value
+
+
+def write_rows(path: str, format: str, chunks: Iterable[List[Dict[str, Any]]]) -> int:
+    if format == "parquet":
+        return _write_parquet(path, chunks)
+    written = 0
+    with open_text(path, "w") as f:
+        writer = None
+        for chunk in chunks:
+            if format == "ndjson":
+                f.write("".join(json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+                                for row in chunk))
+            else:
+                if writer is None:
+                    writer = csv.writer(f)
+                    writer.writerow(list(chunk[0].keys()))
+                writer.writerows([[_csv_cell(value) for value in row.values()] for row in chunk])
+            written += len(chunk)
+    return written
+
+
+def read_rows(path: str, format: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    if format == "parquet":
+        yield from _read_parquet(path, batch_size)
+        return
+    with open_text(path, "r") as f:
+        if format == "ndjson":
+            rows = ({key: _json_value(value) for key, value in json.loads(line).items()}
+                    for line in f if line.strip())
+        else:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            rows = ({key: _csv_value(value) for key, value in zip(header, record)} for record in reader)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _write_parquet(path: str, chunks: Iterable[List[Dict[str, Any]]]) -> int:
+    pa = load_pyarrow()
+    writer = None
+    written = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Table.from_pylist(chunk).schema
+                # columns that are all NULL in the first chunk would be typed null
+                schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                    for field in schema])
+                writer = pa.parquet.ParquetWriter(path, schema, compression="zstd")
+            writer.write_table(pa.Table.from_pylist(chunk, schema=writer.schema))
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def _read_parquet(path: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    pa = load_pyarrow()
+    for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield batch.to_pylist()
@@ -1,42 +1,128 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
 from pycore.dbmode.baseclass.base.dbbase import DBBase
+
+_end_of_rows = object()
+
+
 class Ttransport(DBBase):
 
-    def transport(self, from_db, to_db, tabname, step=10000):
-        from_db = self.get_dbmodefromname(from_db)
-        to_db = self.get_dbmodefromname(to_db)
-        from_dbname = self.get_dbnamefrommode(from_db)
-        to_dbname = self.get_dbnamefrommode(to_db)
-        origin_len = from_db.count(tabname)
-        if origin_len == 0:
+    def transport(self, from_db, to_db, tabname, step=10000, key=None, queue_size=4, resume=True,
+                  checkpoint_file=None):
+        if not from_db.table_exists(tabname):
+            self.warn(f"transport: source table '{tabname}' does not exist.")
             return False
+        fields = from_db.get_table(tabname)
+        key = key or from_db.get_primary_key(tabname)
+        if key not in fields:
+            # e.g. sqlite's rowid fallback: rows do not carry it, and the target numbers its own rowids
+            raise ValueError(f"transport: '{tabname}' has no single-column primary key to copy by; "
+                             f"pass key= a unique column of the table.")
+        if not to_db.table_exists(tabname):
+            to_db.create_table(tabname, fields)
+        checkpoint_file = checkpoint_file or self.get_checkpoint_file(tabname)
+        checkpoint = self.read_checkpoint(checkpoint_file, tabname) if resume else {}
+        last_key = self.resume_key(to_db, tabname, key, checkpoint.get("last_key")) if resume else None
+        copied = checkpoint.get("copied", 0) if last_key is not None else 0
+
+        self.info(f"transport {tabname}: copying by {key} in chunks of {step}, resume after {last_key}")
+        chunks = queue.Queue(maxsize=max(1, queue_size))
+        stop = threading.Event()
+        reader = threading.Thread(target=self._read_chunks,
+                                  args=(from_db, tabname, key, step, last_key, chunks, stop),
+                                  name=f"transport-read-{tabname}", daemon=True)
+        start_time = time.time()
+        reader.start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _end_of_rows:
+                    break
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                with to_db.transaction():
+                    to_db.insert_many(tabname, chunk, result_id=False)
+                copied += len(chunk)
+                last_key = chunk[-1][key]
+                self.save_checkpoint(checkpoint_file, tabname, key, last_key, copied)
+                self.info(f"\t{tabname}: {copied} rows copied, last {key}={last_key}")
+        finally:
+            stop.set()
+            self._drain(chunks)
+            reader.join()
+        self.remove_checkpoint(checkpoint_file)
+        self.success(f"transport {tabname}: {copied} rows in {time.time() - start_time:.1f}s")
+        return copied
+
+    def _read_chunks(self, from_db, tabname, key, step, last_key, chunks: queue.Queue, stop: threading.Event):
+        try:
+            chunk = []
+            for row in from_db.iter_rows(tabname, batch_size=step, key=key, after=last_key, include_deleted=True):
+                chunk.append(row)
+                if len(chunk) >= step:
+                    if not self._put(chunks, chunk, stop):
+                        return
+                    chunk = []
+            if chunk and not self._put(chunks, chunk, stop):
+                return
+            self._put(chunks, _end_of_rows, stop)
+        except BaseException as e:
+            self._put(chunks, e, stop)
+
+    def _put(self, chunks: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, chunks: queue.Queue):
+        while True:
+            try:
+                chunks.get_nowait()
+            except queue.Empty:
+                return
+
+    def resume_key(self, to_db, tabname, key, checkpoint_key: Any = None) -> Any:
+        # Chunks are written in key order and committed atomically, so the
+        # target's max key is always a safe resume point even if the
+        # checkpoint file lags one chunk behind.
+        row = to_db.read_one(tabname, select=f"MAX({key}) AS last_key", include_deleted=True) or {}
+        target_key = row.get("last_key")
+        if target_key is None:
+            return checkpoint_key
+        if checkpoint_key is None:
+            return target_key
+        return max(target_key, checkpoint_key)
+
+    def get_checkpoint_file(self, tabname) -> str:
+        return os.path.join(self.get_out_dir(), "transport", f"{tabname}.checkpoint.json")
+
+    def read_checkpoint(self, checkpoint_file, tabname) -> Dict:
+        if not os.path.isfile(checkpoint_file):
+            return {}
+        try:
+            with open(checkpoint_file, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            self.warn(f"transport: ignoring unreadable checkpoint {checkpoint_file}: {e}")
+            return {}
+        return checkpoint if checkpoint.get("table") == tabname else {}
+
+    def save_checkpoint(self, checkpoint_file, tabname, key, last_key, copied):
+        os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+        tmp_file = f"{checkpoint_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"table": tabname, "key": key, "last_key": last_key, "copied": copied,
+                       "time": time.time()}, f)
+        os.replace(tmp_file, checkpoint_file)
 
-        target_len = 0
-        if to_db.exist_table(tabname) == True:
-            target_len = to_db.count(tabname)
-
-        self.com_util.print_info(f'{tabname} {origin_len},target-count{target_len} data wait copying ')
-        # 每次复制数据
-        limit = self.init_limit(step)
-        limit_start = limit[0]
-        # columns = from_db.get_columns(tabname)
-        while limit_start < (origin_len - 1):
-            limit = self.get_limitincrement()
-            limit_step = limit[0]
-            limit_start = limit[1]
-            limit_end = limit_start + limit_step
-            self.com_util.print_info(f'\treading {tabname}:{limit_start}-{limit_end} from {from_dbname} to {to_dbname}')
-            origin_data = from_db.read(tabname, limit=limit)
-
-            if to_db.exist_table(tabname) == False:
-                fields = from_db.get_fields()
-                to_db.create_table(tabname, fields)
-                print(fields)
-                exit()
-
-            self.com_util.print_info(
-                f'\ttranslating of {tabname}({len(origin_data)} item by data)')
-            # to_db.save(tabname, origin_data)
-            self.com_util.print_info(
-                f'\tSuccessfully! {tabname}')
-            self.com_util.print_info(
-                f'------------------------------------------------------------------------------------')
+    def remove_checkpoint(self, checkpoint_file: Optional[str]):
+        if checkpoint_file and os.path.isfile(checkpoint_file):
+            os.remove(checkpoint_file)
@@ -1,21 +1,53 @@
 # import html
 from pycore.dbmode.baseclass.abs.dbcommon import *
 from mongoengine import (Document, StringField, IntField, LongField, FloatField, DecimalField, BooleanField,
-                         DateTimeField, DateField, BinaryField, FileField)
+                         DateTimeField, DateField, BinaryField, FileField, ValidationError, FieldDoesNotExist)
 # import time
 # import json
 # import os
 import re
 # import pymongo
 # from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError
 from mongoengine.queryset.visitor import Q
 from mongoengine import connect
+from pycore.dbmode.baseclass.metrics import DBMetrics
+
+
+class MongoMetricsListener(monitoring.CommandListener):
+    # pymongo reports every wire command here, with its server-side duration
+
+    def __init__(self, metrics: DBMetrics):
+        self.metrics = metrics
+        self._commands = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        target = f"{event.database_name}.{collection}" if isinstance(collection, str) else event.database_name
+        self._commands[event.request_id] = f"{event.command_name} {target}"
+
+    def succeeded(self, event):
+        statement = self._commands.pop(event.request_id, event.command_name)
+        reply = event.reply or {}
+        cursor = reply.get("cursor") or {}
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        rows = len(batch) if batch is not None else reply.get("n", -1)
+        self.metrics.statement(statement, event.duration_micros / 1e6, rows, operation=event.command_name.lower())
+
+    def failed(self, event):
+        statement = self._commands.pop(event.request_id, event.command_name)
+        self.metrics.statement(statement, event.duration_micros / 1e6, error=True,
+                               operation=event.command_name.lower())
 
 
 class Mongo(DBBase):
     __tablemaps = {}
     __tablefieldsmaps = {}
+    # prefixed so it cannot clash with an application table called "counters"
+    __counter_collection = "__pycore_counters"
     session = None
+    metrics = None
     __type_map = {
         "INT": IntField,
         "INTEGER": IntField,
@@ -51,7 +83,8 @@ class Mongo(DBBase):
     tablemaps = {}
 
     def __init__(self, args):
-        pass
+        # (database, collection) pairs whose counter was seeded from the collection's max id
+        self.seeded_counters = set()
 
     def main(self, args):
         self.init_database()
@@ -214,19 +247,54 @@ class Mongo(DBBase):
                 data['id'] = max_id
         return data
 
+    def reserve_ids(self, tabname, table_class, count):
+        # 计数器集合中原子地预留一段连续ID
+        if count <= 0:
+            return []
+        db = table_class._get_db()
+        counters = db[self.__counter_collection]
+        seed_key = (db.name, table_class._get_collection_name())
+        counter = None
+        if seed_key in self.seeded_counters:
+            # no upsert: a missing counter (dropped meanwhile) is seeded again below
+            counter = counters.find_one_and_update({"_id": tabname}, {"$inc": {"seq": count}},
+                                                   return_document=ReturnDocument.AFTER)
+        if counter is None:
+            first_item = table_class.objects().order_by('-id').first()
+            max_id = first_item.id if first_item else 0
+            if not isinstance(max_id, int):
+                max_id = int(max_id) if self.com_string.is_number(max_id) else 0
+            counters.update_one({"_id": tabname}, {"$max": {"seq": max_id}}, upsert=True)
+            self.seeded_counters.add(seed_key)
+            counter = counters.find_one_and_update({"_id": tabname}, {"$inc": {"seq": count}}, upsert=True,
+                                                   return_document=ReturnDocument.AFTER)
+        last_id = counter["seq"]
+        return list(range(last_id - count + 1, last_id + 1))
+
+    def reset_id_counters(self):
+        """Re-seed id counters from the collections on next use, e.g. after restoring a collection."""
+        self.seeded_counters.clear()
+
     def increment_ids(self, data, table_class, tabname):
-        if isinstance(data, list):
-            for i in range(len(data)):
-                item = data[i]
-                data[i] = self.increment_idfordata(item, table_class, tabname)
-        else:
-            data = self.increment_idfordata(data, table_class, tabname)
+        if getattr(table_class, 'id', None) is None:
+            return data
+        items = data if isinstance(data, list) else [data]
+        missing = [item for item in items if 'id' not in item]
+        for item, new_id in zip(missing, self.reserve_ids(tabname, table_class, len(missing))):
+            item['id'] = new_id
         return data
 
     def list_escape(self, tabname, data):
-        for index in range(len(data)):
-            value = data[index]
-            data[index] = self.dict_escape(tabname, value)
+        maps = self.get_tablefieldsmaps().get(tabname)
+        create_time = self.com_string.create_time()
+        field_types = {}
+        for item in data:
+            if "time" not in item:
+                item["time"] = create_time
+            for key, value in item.items():
+                if key not in field_types:
+                    field_types[key] = maps.get(key)
+                item[key] = self.convert_to_type(value, field_types[key])
         return data
 
     def convert_to_type(self, value, field_type):
@@ -273,7 +341,10 @@ class Mongo(DBBase):
             data = self.dict_escape(tabname, data)
         return data
 
-    def save(self, tabname=None, data=None, result_id=True):
+    def has_file_fields(self, table_class):
+        return any(isinstance(field, FileField) for field in table_class._fields.values())
+
+    def save(self, tabname=None, data=None, result_id=True, batch=True):
         tablemaps = self.get_tablemaps()
         table_class = tablemaps.get(tabname)
         if not table_class:
@@ -289,6 +360,9 @@ class Mongo(DBBase):
 
         if isinstance(data, dict):
             data = [data]
+        if batch and len(data) > 1 and not self.has_file_fields(table_class):
+            saved_ids = self.save_batch(table_class, data)
+            return saved_ids if result_id else None
         # documents_list = [table_class(**item) for item in data]
         # # 一次性插入文档对象列表
         # table_class.objects.insert(documents_list,load_bulk=False)
@@ -303,6 +377,29 @@ class Mongo(DBBase):
             self.com_util.print_warn("save Invalid data type for 'data' parameter. Expected list or dict.")
             return None
 
+    def save_batch(self, table_class, data):
+        # validate()/to_mongo() per document, so defaults and field checks apply as in save_item
+        documents = []
+        for item in data:
+            try:
+                record = table_class(**item)
+                record.validate()
+                documents.append(record.to_mongo())
+            except (ValidationError, FieldDoesNotExist) as e:
+                self.com_util.print_warn(f"MongoDB save error: {e}")
+        if not documents:
+            return []
+        failed = set()
+        try:
+            table_class._get_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                # 11000: duplicate key, same as the unique check in save_item
+                if error.get("code") != 11000:
+                    self.com_util.print_warn(f"MongoDB save error: {error.get('errmsg')}")
+                failed.add(error.get("index"))
+        return [document["_id"] for index, document in enumerate(documents) if index not in failed]
+
     def save_item(self, table_class, data):
         try:
             # 创建记录实例，但不存储FileField字段
@@ -324,6 +421,45 @@ class Mongo(DBBase):
                 self.com_util.print_warn(f"MongoDB save error: {e}")
             return None
 
+    def upsert_many(self, tabname, data, key_fields, chunk_size=1000):
+        counts = {"inserted": 0, "updated": 0}
+        tablemaps = self.get_tablemaps()
+        table_class = tablemaps.get(tabname)
+        if not table_class:
+            self.com_util.print_warn("upsert_many tabname must be provided")
+            return counts
+        if not data:
+            return counts
+        self.connect()
+        if isinstance(key_fields, str):
+            key_fields = [key_fields]
+        db_keys = ["_id" if field == "id" else field for field in key_fields]
+        collection = table_class._get_collection()
+        for start in range(0, len(data), chunk_size):
+            raw = data[start:start + chunk_size]
+            chunk = self.list_escape(tabname, [dict(item) for item in raw])
+            new_ids = iter(self.reserve_ids(tabname, table_class, sum(1 for item in chunk if 'id' not in item)))
+            operations = []
+            for original, item in zip(raw, chunk):
+                document = {("_id" if key == "id" else key): value for key, value in item.items()}
+                query = {db_key: document[db_key] for db_key in db_keys}
+                # the creation time list_escape fills in must not overwrite the stored one on updates
+                keep_time = "time" in document and "time" not in original
+                update = {"$set": {key: value for key, value in document.items()
+                                   if key != "_id" and not (keep_time and key == "time")}}
+                on_insert = {"time": document["time"]} if keep_time else {}
+                if "_id" not in document:
+                    on_insert["_id"] = next(new_ids)
+                elif "_id" not in query:
+                    on_insert["_id"] = document["_id"]
+                if on_insert:
+                    update["$setOnInsert"] = on_insert
+                operations.append(UpdateOne(query, update, upsert=True))
+            result = collection.bulk_write(operations, ordered=False)
+            counts["inserted"] += result.upserted_count
+            counts["updated"] += result.matched_count
+        return counts
+
     def filter_query(self, conditions=None):
         query = Q()
         nulls = ["", "null", "None", None]
@@ -484,6 +620,11 @@ class Mongo(DBBase):
         else:
             return updated_ids
 
+    def enable_metrics(self, *sinks, slow_query_ms=None):
+        # must run before connect(): the listener is handed to the client
+        self.metrics = DBMetrics("mongo", sinks, slow_query_ms=slow_query_ms)
+        return self.metrics
+
     def connect(self):
         if self.session is not None:
             return self.session
@@ -492,9 +633,11 @@ class Mongo(DBBase):
         host = self.com_config.get_global('mongo_host')
         port = self.com_config.get_global('mongo_port')
         db_name = self.com_config.get_global('mongo_database')
+        options = {"event_listeners": [MongoMetricsListener(self.metrics)]} if self.metrics is not None else {}
         if username and password:
-            self.session = connect(db=db_name, host=host, port=int(port), username=username, password=password)
+            self.session = connect(db=db_name, host=host, port=int(port), username=username, password=password,
+                                   **options)
         else:
-            self.session = connect(db=db_name, host=host, port=int(port))
+            self.session = connect(db=db_name, host=host, port=int(port), **options)
 
         return self.session
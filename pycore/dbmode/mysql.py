@@ -1,12 +1,24 @@
-from sqlalchemy import create_engine, text
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
 from typing import Dict, List, Union, Tuple, Optional, Any
-from pycore.dbmode.baseclass.dbtoolbase import DBToolBase
+from pycore.dbmode.baseclass.dbtoolbase import DBToolBase, cached_read, deleted_column, invalidates_cache, \
+    live_condition
+
+# MySQL 5.7's server default; used when @@max_allowed_packet cannot be read
+default_max_allowed_packet = 4 * 1024 * 1024
+load_data_escapes = ((b"\\", b"\\\\"), (b"\t", b"\\t"), (b"\n", b"\\n"), (b"\r", b"\\r"), (b"\0", b"\\0"))
 
 
 class MySQL(DBToolBase):
 
-    def __init__(self, config_or_dburl: str, init_config_file: str = '', debug: bool = False):
+    def __init__(self, config_or_dburl: str, init_config_file: str = '', debug: bool = False,
+                 local_infile: bool = False, bulk_rows: int = 5000, load_data_threshold: int = 100000):
         db_url = self.get_db_url_from_config(config_or_dburl)
         print("db_url", db_url)
         self.db_url = db_url
@@ -14,8 +26,17 @@ class MySQL(DBToolBase):
         self.include_filter = []
         self.exclude_filter = []
         self.show_sql = debug
-        self.engine = create_engine(self.db_url, echo=self.show_sql)
+        self.local_infile = local_infile
+        self.bulk_rows = bulk_rows
+        self.load_data_threshold = load_data_threshold
+        self._max_allowed_packet = None
+        self._tombstone_tables = {}
+        self._deleted_time_tables = {}
+        self._metrics_listening = False
+        connect_args = {"local_infile": True} if local_infile and self.db_url.startswith("mysql") else {}
+        self.engine = create_engine(self.db_url, echo=self.show_sql, connect_args=connect_args)
         self.Session = sessionmaker(bind=self.engine)
+        self._local = threading.local()
 
     def set_debug(self, debug):
         self.show_sql = debug
@@ -56,82 +77,405 @@ class MySQL(DBToolBase):
 
     def _connect(self):
         self.session = self.Session()
+        return self.session
 
     def _close(self):
         self.session.close()
 
+    def in_transaction(self) -> bool:
+        return getattr(self._local, "session", None) is not None
+
+    @contextmanager
+    def transaction(self):
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            with session.begin_nested():
+                yield self
+            return
+        session = self.Session()
+        self._local.session = session
+        try:
+            if self.metrics is not None:
+                self._checkout(session.connection)
+            yield self
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            self._local.session = None
+            session.close()
+            self.flush_dirty_tables()
+
+    def batch(self):
+        return self.transaction()
+
     def _execute(self, sql: str, params: Union[Tuple, List[Tuple]] = (), many: bool = False):
-        self._connect()
         if self.show_sql:
             print(sql)
-        if many:
-            result = self.session.execute(text(sql), params)
+        started = time.perf_counter()
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            result = session.execute(self._text(sql), params)
         else:
-            result = self.session.execute(text(sql), params)
-        self.session.commit()
-        self._close()
+            session = self.Session()
+            try:
+                if self.metrics is not None:
+                    self._checkout(session.connection)
+                result = session.execute(self._text(sql), params)
+                session.commit()
+            finally:
+                session.close()
+        if self.slow_query_ms is not None:
+            self.check_slow_query(sql, params, started, many)
         return result
 
+    def _run_batch(self, execute):
+        # One pooled connection and one transaction per batch, unless the
+        # caller already opened a transaction() on this thread.
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            return execute(session.connection())
+        conn = self._checkout(self.engine.connect)
+        with conn, conn.begin():
+            return execute(conn)
+
+    def _checkout(self, connect):
+        if self.metrics is None:
+            return connect()
+        pool = self.engine.pool
+        # QueuePool only blocks once every pooled connection is checked out
+        saturated = hasattr(pool, "checkedout") and hasattr(pool, "size") and pool.checkedout() >= pool.size()
+        started = time.perf_counter()
+        conn = connect()
+        elapsed = time.perf_counter() - started
+        self.metrics.acquire(elapsed)
+        if saturated:
+            self.metrics.pool_wait(elapsed)
+        return conn
+
+    def _attach_metrics(self):
+        # statement timing comes from engine events, so bulk inserts, iter_rows and
+        # raw exec_driver_sql calls are all covered
+        if self.metrics is None or self._metrics_listening:
+            return
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(self.engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(self.engine, "handle_error", self._on_statement_error)
+        self._metrics_listening = True
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        if self.metrics is not None:
+            self.metrics.statement(statement, time.perf_counter() - started, cursor.rowcount)
+
+    def _on_statement_error(self, exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            started = starts.pop()
+            if self.metrics is not None:
+                self.metrics.statement(exception_context.statement or "", time.perf_counter() - started,
+                                       error=True)
+
+    def get_max_allowed_packet(self) -> int:
+        if self._max_allowed_packet is None:
+            try:
+                with self.engine.connect() as conn:
+                    self._max_allowed_packet = int(conn.exec_driver_sql("SELECT @@max_allowed_packet").scalar())
+            except DBAPIError:
+                self._max_allowed_packet = default_max_allowed_packet
+        return self._max_allowed_packet
+
+    def _placeholder(self) -> str:
+        return "?" if self.engine.dialect.paramstyle == "qmark" else "%s"
+
+    def _value_size(self, value) -> int:
+        if value is None:
+            return 4
+        if isinstance(value, str):
+            return len(value.encode("utf-8", "surrogatepass")) + 2
+        if isinstance(value, (bytes, bytearray)):
+            return 2 * len(value) + 10
+        return 24
+
+    def bulk_batches(self, columns: Tuple[str, ...], data: List[Dict], max_rows: int = None):
+        # Split rows so each multi-row INSERT stays under max_allowed_packet,
+        # keeping ~10% headroom for quoting and escaping.
+        budget = int(self.get_max_allowed_packet() * 0.9) - 1024
+        max_rows = max(1, int(max_rows or self.bulk_rows))
+        batch = []
+        size = 0
+        for row in data:
+            values = tuple(row[col] for col in columns)
+            row_size = sum(self._value_size(value) + 2 for value in values) + 4
+            if batch and (size + row_size > budget or len(batch) >= max_rows):
+                yield batch
+                batch = []
+                size = 0
+            batch.append(values)
+            size += row_size
+        if batch:
+            yield batch
+
+    @invalidates_cache
+    def load_data(self, tabname: str, data: Union[str, List[Dict]], columns: Tuple[str, ...] = None) -> int:
+        """
+        LOAD DATA LOCAL INFILE from a tab-separated file, or from rows written to a temp file.
+        Needs local_infile=True here and local_infile=ON on the server.
+        """
+        if not self.local_infile:
+            raise ValueError("load_data needs MySQL(..., local_infile=True).")
+        temp_file = None
+        if isinstance(data, str):
+            path = data
+        else:
+            if not data:
+                return 0
+            columns = columns or tuple(data[0].keys())
+            with tempfile.NamedTemporaryFile("wb", suffix=".tsv", delete=False) as f:
+                temp_file = path = f.name
+                for row in data:
+                    f.write(b"\t".join(self._load_data_field(row[col]) for col in columns) + b"\n")
+        column_list = f" ({', '.join(columns)})" if columns else ""
+        escaped_path = path.replace("\\", "\\\\").replace("'", "\\'")
+        sql = (f"LOAD DATA LOCAL INFILE '{escaped_path}' INTO TABLE {tabname} CHARACTER SET utf8mb4 "
+               f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'{column_list}")
+        if self.show_sql:
+            print(sql)
+        try:
+            return self._run_batch(lambda conn: conn.exec_driver_sql(sql).rowcount)
+        finally:
+            if temp_file:
+                os.remove(temp_file)
+
+    def _load_data_field(self, value) -> bytes:
+        if value is None:
+            return b"\\N"
+        if isinstance(value, bool):
+            return b"1" if value else b"0"
+        if isinstance(value, (bytes, bytearray)):
+            field = bytes(value)
+        else:
+            field = str(value).encode("utf-8")
+        for raw, escaped in load_data_escapes:
+            field = field.replace(raw, escaped)
+        return field
+
     def init_database(self, table_maps: Dict[str, Dict[str, Dict[str, Union[str, bool, Optional[str]]]]]):
         self.create_tables(table_maps)
 
+    def _text(self, sql: str):
+        return self.cached_sql(("mysql", "text", sql), lambda: text(sql))
+
+    def _insert_sql(self, tabname: str, columns: Tuple[str, ...]) -> str:
+        return self.cached_sql(("mysql", "insert", tabname, columns),
+                               lambda: f"INSERT INTO {tabname} ({', '.join(columns)}) "
+                                       f"VALUES ({', '.join([f':{key}' for key in columns])})")
+
+    def _update_sql(self, tabname: str, columns: Tuple[str, ...], shape: Tuple) -> str:
+        return self.cached_sql(("mysql", "update", tabname, columns, shape),
+                               lambda: f"UPDATE {tabname} SET {', '.join([f'{key} = :{key}' for key in columns])} "
+                                       f"WHERE {self.compile_conditions(shape, 'mysql')}")
+
+    def _select_sql(self, tablename: str, select: str, shape: Tuple, sort: Tuple = (), limit: bool = False) -> str:
+        def build():
+            where = f" WHERE {self.compile_conditions(shape, 'mysql')}" if shape else ""
+            limit_clause = " LIMIT :_offset, :_limit" if limit else ""
+            return f"SELECT {select} FROM {tablename}{where}{self.sort_clause(dict(sort))}{limit_clause}"
+        return self.cached_sql(("mysql", "select", tablename, select, shape, sort, limit), build)
+
+    @invalidates_cache
     def insert_one(self, tabname: str, data: Dict, result_id: bool = True):
-        keys = ', '.join(data.keys())
-        question_marks = ', '.join([f":{key}" for key in data.keys()])
-        sql = f"INSERT INTO {tabname} ({keys}) VALUES ({question_marks})"
+        sql = self._insert_sql(tabname, tuple(data.keys()))
         result = self._execute(sql, data)
         if result_id:
             return result.lastrowid
 
+    @invalidates_cache
     def update_one(self, tabname: str, data: Dict, conditions: Dict):
-        set_clause = ', '.join([f"{key} = :{key}" for key in data.keys()])
         where_clause, values = self._build_conditions(conditions)
-        sql = f"UPDATE {tabname} SET {set_clause} WHERE {where_clause}"
+        sql = self._update_sql(tabname, tuple(data.keys()), self.condition_shape(conditions or {}))
         self._execute(sql, {**data, **values})
 
-    def read_one(self, tablename: str, conditions: Dict = None, select: str = "*") -> Optional[Dict[str, Any]]:
+    @cached_read
+    def read_one(self, tablename: str, conditions: Dict = None, select: str = "*",
+                 include_deleted: bool = False) -> Optional[Dict[str, Any]]:
+        conditions = self.live_conditions(tablename, conditions, include_deleted)
         where_clause, values = self._build_conditions(conditions)
-        sql = f"SELECT {select} FROM {tablename} WHERE {where_clause}" if where_clause else f"SELECT {select} FROM {tablename}"
+        sql = self._select_sql(tablename, select, self.condition_shape(conditions or {}))
         result = self._execute(sql, values).fetchone()
-        return dict(result) if result else None
+        return dict(result._mapping) if result else None
 
+    @invalidates_cache
     def insert_many(self, tabname: str, data: List[Dict], result_id: bool = True):
         if not data:
             return
-        keys = ', '.join(data[0].keys())
-        question_marks = ', '.join([f":{key}" for key in data[0].keys()])
-        sql = f"INSERT INTO {tabname} ({keys}) VALUES ({question_marks})"
-        result = self._execute(sql, data, many=True)
+        columns = tuple(data[0].keys())
+        if self.local_infile and len(data) >= self.load_data_threshold:
+            self.load_data(tabname, data, columns)
+            return
+        placeholder = self._placeholder()
+        row_placeholders = f"({', '.join([placeholder] * len(columns))})"
+        prefix = f"INSERT INTO {tabname} ({', '.join(columns)}) VALUES "
+        lastrowid = None
+        # 65535 is the protocol's placeholder limit for server-side prepared statements
+        for batch in self.bulk_batches(columns, data, min(self.bulk_rows, 65535 // len(columns))):
+            sql = prefix + ", ".join([row_placeholders] * len(batch))
+            params = tuple(value for values in batch for value in values)
+            if self.show_sql:
+                print(f"{prefix}... ({len(batch)} rows)")
+            lastrowid = self._run_batch(lambda conn: conn.exec_driver_sql(sql, params).lastrowid)
         if result_id:
-            return result.lastrowid
+            return lastrowid
 
+    @invalidates_cache
     def update_many(self, tabname: str, data: List[Dict], conditions: Dict):
         if not data:
             return
-        set_clause = ', '.join([f"{key} = :{key}" for key in data[0].keys()])
         where_clause, cond_values = self._build_conditions(conditions)
-        values = [{**d, **cond_values} for d in data]
-        sql = f"UPDATE {tabname} SET {set_clause} WHERE {where_clause}"
-        self._execute(sql, values, many=True)
-
+        sql = self._update_sql(tabname, tuple(data[0].keys()), self.condition_shape(conditions or {}))
+        statement = self._text(sql)
+        if self.show_sql:
+            print(sql)
+        for chunk in self.chunked(data, self.bulk_rows):
+            values = [{**d, **cond_values} for d in chunk]
+            self._run_batch(lambda conn: conn.execute(statement, values))
+
+    @invalidates_cache
+    def upsert_many(self, tabname: str, data: List[Dict], key_fields: Union[str, List[str]],
+                    chunk_size: int = 500) -> Dict[str, int]:
+        counts = {"inserted": 0, "updated": 0}
+        if not data:
+            return counts
+        key_fields = [key_fields] if isinstance(key_fields, str) else list(key_fields)
+        columns = tuple(data[0].keys())
+
+        def build():
+            update_columns = [col for col in columns if col not in key_fields] or key_fields[:1]
+            set_clause = ', '.join([f"{col} = VALUES({col})" for col in update_columns])
+            return f"{self._insert_sql(tabname, columns)} ON DUPLICATE KEY UPDATE {set_clause}"
+        sql = self.cached_sql(("mysql", "upsert", tabname, columns, tuple(key_fields)), build)
+        key_list = ', '.join(key_fields)
+        for chunk in self.chunked(data, chunk_size):
+            params = {}
+            placeholders = []
+            for index, row in enumerate(chunk):
+                names = [f"k{index}_{pos}" for pos in range(len(key_fields))]
+                params.update({name: row[field] for name, field in zip(names, key_fields)})
+                placeholders.append(f"({', '.join(':' + name for name in names)})")
+            exists_sql = f"SELECT {key_list} FROM {tabname} WHERE ({key_list}) IN ({', '.join(placeholders)})"
+            with self.transaction():
+                existing = [tuple(row) for row in self._execute(exists_sql, params).fetchall()]
+                self._execute(sql, [{col: row[col] for col in columns} for row in chunk], many=True)
+            inserted, updated = self.upsert_counts(chunk, key_fields, existing)
+            counts["inserted"] += inserted
+            counts["updated"] += updated
+        return counts
+
+    @cached_read
     def read_many(self, tablename: str, conditions: Dict = None, limit: Tuple[int, int] = (0, 1000),
-                  select: str = "*", sort: Dict[str, str] = None, print_sql: bool = False) -> List[Dict[str, Any]]:
+                  select: str = "*", sort: Dict[str, str] = None, print_sql: bool = False,
+                  include_deleted: bool = False) -> List[Dict[str, Any]]:
+        conditions = self.live_conditions(tablename, conditions, include_deleted)
         where_clause, values = self._build_conditions(conditions)
-        limit_clause = f" LIMIT {limit[0]}, {limit[1]}"
-        sort_clause = ' ORDER BY ' + ', '.join([f"{key} {value}" for key, value in sort.items()]) if sort else ''
-        sql = f"SELECT {select} FROM {tablename} WHERE {where_clause}{sort_clause}{limit_clause}" if where_clause else f"SELECT {select} FROM {tablename}{sort_clause}{limit_clause}"
-        result = self._execute(sql, values)
-        data = [dict(row) for row in result]
+        sql = self._select_sql(tablename, select, self.condition_shape(conditions or {}),
+                               tuple(sort.items()) if sort else (), limit=True)
+        result = self._execute(sql, {**values, "_offset": limit[0], "_limit": limit[1]})
+        data = [dict(row._mapping) for row in result]
         return data
 
+    def get_primary_key(self, tablename: str) -> str:
+        keys = [name for name, info in self.get_table(tablename).items() if info["primary_key"]]
+        if len(keys) != 1:
+            raise ValueError(f"Table '{tablename}' has no single-column primary key; pass key= explicitly.")
+        return keys[0]
+
+    def iter_rows(self, tablename: str, conditions: Dict = None, batch_size: int = 1000, select: str = "*",
+                  key: str = None, row_type: str = "dict", after: Any = None, include_deleted: bool = False):
+        key = key or self.get_primary_key(tablename)
+        conditions = self.live_conditions(tablename, conditions, include_deleted)
+        where_clause, values = self._build_conditions(conditions)
+        shape = self.condition_shape(conditions or {})
+        # MySQL only accepts a bare * first in the select list, so it is qualified behind the key column
+        columns = f"{tablename}.{key} AS _key, " + (f"{tablename}.*" if select.strip() == "*" else select)
+        first_sql = self._select_sql(tablename, columns, shape, ((key, "ASC"),), limit=True)
+
+        def build_next():
+            # the cursor has its own placeholder: :w_{key} may already hold a condition on the key column
+            where = " AND ".join(([self.compile_conditions(shape, "mysql")] if shape else []) + [f"{key} > :_after"])
+            return (f"SELECT {columns} FROM {tablename} WHERE {where}{self.sort_clause({key: 'ASC'})}"
+                    f" LIMIT :_offset, :_limit")
+        next_sql = self.cached_sql(("mysql", "iter_rows", tablename, select, shape, key), build_next)
+        last_key = after
+        build_row = None
+        while True:
+            params = {**values, "_offset": 0, "_limit": batch_size}
+            if last_key is None:
+                sql = first_sql
+            else:
+                sql = next_sql
+                params["_after"] = last_key
+            if self.show_sql:
+                print(sql)
+            session = getattr(self._local, "session", None)
+            if session is not None:
+                result = session.execute(self._text(sql), params)
+                rows = result.fetchmany(batch_size)
+                columns = list(result.keys())
+            else:
+                with self._checkout(self.engine.connect) as conn:
+                    result = conn.execute(self._text(sql), params)
+                    rows = result.fetchmany(batch_size)
+                    columns = list(result.keys())
+            if build_row is None:
+                build_row = self.row_builder(columns[1:], row_type, tablename)
+            for row in rows:
+                yield build_row(row[1:])
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+
+    @invalidates_cache
     def delete(self, tabname: str, conditions: Dict = None, physical: bool = False):
         where_clause, values = self._build_conditions(conditions)
+        shape = self.condition_shape(conditions or {})
         if physical:
-            sql = f"DELETE FROM {tabname} WHERE {where_clause}"
+            sql = self.cached_sql(("mysql", "delete", tabname, shape),
+                                  lambda: f"DELETE FROM {tabname} WHERE {where_clause}")
         else:
-            sql = f"UPDATE {tabname} SET deleted = 1 WHERE {where_clause}"
+            tombstone = self.tombstone_values(tabname)
+            sql = self._update_sql(tabname, tuple(tombstone.keys()), shape)
+            values = {**values, **tombstone}
         self._execute(sql, values)
 
+    def has_tombstones(self, tablename: str) -> bool:
+        # SHOW FULL COLUMNS is a round trip, and this runs on every read
+        has_column = self._tombstone_tables.get(tablename)
+        if has_column is None:
+            has_column = self._tombstone_tables[tablename] = super().has_tombstones(tablename)
+        return has_column
+
+    def has_deleted_time(self, tablename: str) -> bool:
+        # checked on every soft delete, cached like has_tombstones
+        has_column = self._deleted_time_tables.get(tablename)
+        if has_column is None:
+            has_column = self._deleted_time_tables[tablename] = super().has_deleted_time(tablename)
+        return has_column
+
+    def _purge_batch(self, tablename: str, cutoff: Optional[str], batch_size: int) -> int:
+        where = "deleted != 0 AND deleted_time < :cutoff" if cutoff else "deleted != 0"
+        result = self._execute(f"DELETE FROM {tablename} WHERE {where} LIMIT :_limit",
+                               {"cutoff": cutoff, "_limit": batch_size})
+        return result.rowcount
+
+    def compact(self, tablename: str):
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql(f"OPTIMIZE TABLE {tablename}").fetchall()
+
     def get_session(self):
         self._connect()
         return self.session
@@ -170,10 +514,11 @@ class MySQL(DBToolBase):
     def create_table(self, tablename: str, fields: Dict):
         if self.table_exists(tablename):
             self.info(f"Table '{tablename}' already exists. Skipping creation.")
+            self.ensure_indexes(tablename, fields)
             return
         columns = []
         is_bad_table = False
-        for name, info in fields.items():
+        for name, info in self.table_fields(fields).items():
             column_type = info['type']
             if not column_type or column_type == "":
                 self.warn(f"Column type for '{name}' does not exist, skipping this field.")
@@ -192,59 +537,72 @@ class MySQL(DBToolBase):
         else:
             sql = f"CREATE TABLE {tablename} ({', '.join(columns)})"
             self._execute(sql)
+            self._tombstone_tables.pop(tablename, None)
+            self._deleted_time_tables.pop(tablename, None)
             self.success(f"Table '{tablename}' created successfully.")
+            self.ensure_indexes(tablename, fields)
+
+    def get_indexes(self, tablename: str) -> Dict[str, Dict[str, Any]]:
+        indexes = {}
+        with self.engine.connect() as conn:
+            rows = conn.execute(self._text(f"SHOW INDEX FROM {tablename}")).mappings().fetchall()
+        for row in sorted(rows, key=lambda row: (row["Key_name"], row["Seq_in_index"])):
+            name = row["Key_name"]
+            if name == "PRIMARY":
+                continue
+            index = indexes.setdefault(name, {"columns": (), "unique": not row["Non_unique"]})
+            index["columns"] += (row["Column_name"],)
+        return indexes
+
+    def index_columns(self, index: Dict[str, Any]) -> Tuple[str, ...]:
+        # MySQL has no partial indexes: a live index gets `deleted` as its last column
+        # instead, which serves the same live lookups (MySQL reads deleted = 0 OR NULL as ref_or_null)
+        where = index.get("where")
+        if where and where != live_condition:
+            raise ValueError(f"MySQL cannot create partial index {index['name']} WHERE {where}.")
+        return tuple(index["columns"]) + ((deleted_column,) if where else ())
+
+    def index_matches(self, current: Dict[str, Any], index: Dict[str, Any]) -> bool:
+        columns = tuple(self.index_column_name(column) for column in self.index_columns(index))
+        return current["columns"] == columns and current["unique"] == index["unique"]
+
+    def create_index(self, tablename: str, index: Dict[str, Any]):
+        # TEXT/BLOB columns need a prefix length in the declaration, e.g. "word(64)"
+        unique = "UNIQUE " if index.get("unique") else ""
+        columns = ", ".join(self.index_columns(index))
+        self._execute(f"CREATE {unique}INDEX {index['name']} ON {tablename} ({columns})")
+
+    def drop_index(self, tablename: str, name: str):
+        self._execute(f"DROP INDEX {name} ON {tablename}")
+
+    def explain(self, sql: str, params: Dict = None) -> List[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(self._text(f"EXPLAIN {sql}"), params or {}).mappings()]
+
+    def plan_scans(self, plan: List[Dict[str, Any]]) -> List[str]:
+        return [row["table"] for row in plan if row.get("type") == "ALL" and row.get("table")]
 
     def create_tables(self, table_maps: Dict):
         for tablename, fields in table_maps.items():
             self.create_table(tablename, fields)
 
+    @invalidates_cache
     def drop_table(self, tablename: str):
         sql = f"DROP TABLE IF EXISTS {tablename}"
         self._execute(sql)
+        self._tombstone_tables.pop(tablename, None)
+        self._deleted_time_tables.pop(tablename, None)
 
     def table_exists(self, tablename: str) -> bool:
-        sql = f"SELECT 1 FROM information_schema.tables WHERE table_name = '{tablename}'"
-        result = self._execute(sql).fetchone()
+        sql = "SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = :tablename"
+        result = self._execute(sql, {"tablename": tablename}).fetchone()
         return result is not None
 
     def migrate_data(self, target_db: Any):
         pass
 
-    def _build_conditions(self, conditions: Dict[str, str]):
-        if not conditions:
-            return "", ()
-        clauses = []
-        values = []
-        for key, val in conditions.items():
-            if val.startswith(">="):
-                clauses.append(f"{key} >= %s")
-                values.append(val[2:])
-            elif val.startswith("<="):
-                clauses.append(f"{key} <= %s")
-                values.append(val[2:])
-            elif val.startswith(">"):
-                clauses.append(f"{key} > %s")
-                values.append(val[1:])
-            elif val.startswith("<"):
-                clauses.append(f"{key} < %s")
-                values.append(val[1:])
-            elif val.startswith("!="):
-                clauses.append(f"{key} != %s")
-                values.append(val[2:])
-            elif val.startswith("%") and val.endswith("%"):
-                clauses.append(f"{key} LIKE %s")
-                values.append(val)
-            elif val.startswith("%"):
-                clauses.append(f"{key} LIKE %s")
-                values.append(f"%{val[1:]}")
-            elif val.endswith("%"):
-                clauses.append(f"{key} LIKE %s")
-                values.append(f"{val[:-1]}%")
-            else:
-                clauses.append(f"{key} = %s")
-                values.append(val)
-        return " AND ".join(clauses), tuple(values)
-
+    def _build_conditions(self, conditions: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        return super().build_conditions_mysql(conditions=conditions)
 
     def _get_column_type(self, col_type: str):
         type_mapping = {
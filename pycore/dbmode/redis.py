@@ -1,11 +1,180 @@
 from pycore.base.base import Base
 import redis
+import base64
+import gzip
 import json
 import threading
 
 threadingLock = threading.Lock()
 GLOBAL_DB = None
 
+# 列表的伴生索引: {tab}:__members 记录序列化值的出现次数(用于 unique 判断),
+# {tab}:__keys 记录元素的字段名/值的出现次数(用于 is_column 判断),
+# {tab}:__indexed 为 "1" 表示索引与列表一致. 维护都在服务端脚本中完成; 列表被 DEL 或过期后
+# 脚本会先清空索引, 索引键跟随列表的 TTL. 首次建索引由客户端按 LRANGE 分页写入
+# {tab}:__members_build / {tab}:__keys_build 再原子替换, 不会在一个脚本里遍历整个列表.
+INDEX_SUFFIXES = (b":__members", b":__keys", b":__indexed", b":__members_build", b":__keys_build")
+INDEX_PAGE_SIZE = 1000
+
+_LUA_INDEX_HELPERS = """
+local function element_keys(item)
+    local ok, decoded = pcall(cjson.decode, item)
+    local keys = {}
+    if ok and type(decoded) == 'table' then
+        for k, v in pairs(decoded) do
+            if type(k) == 'number' then
+                if type(v) == 'string' or type(v) == 'number' then keys[#keys + 1] = tostring(v) end
+            else
+                keys[#keys + 1] = k
+            end
+        end
+    else
+        keys[1] = item
+    end
+    return keys
+end
+local function incr(hash, field, n)
+    if redis.call('HINCRBY', hash, field, n) <= 0 then redis.call('HDEL', hash, field) end
+end
+local function index_update(item, n)
+    incr(KEYS[2], item, n)
+    for _, k in ipairs(element_keys(item)) do incr(KEYS[3], k, n) end
+end
+"""
+
+# KEYS: list, members, keys, flag
+_LUA_INDEX_STATE = _LUA_INDEX_HELPERS + """
+local function build_all()
+    redis.call('DEL', KEYS[2], KEYS[3])
+    local total = redis.call('LLEN', KEYS[1])
+    for start = 0, total - 1, 1000 do
+        for _, item in ipairs(redis.call('LRANGE', KEYS[1], start, start + 999)) do index_update(item, 1) end
+    end
+    redis.call('SET', KEYS[4], 1)
+end
+local function ensure_ready()
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        -- DEL'd or expired list: whatever the index still holds is stale
+        redis.call('DEL', KEYS[2], KEYS[3])
+        redis.call('SET', KEYS[4], 1)
+    elseif redis.call('GET', KEYS[4]) ~= '1' then
+        -- a client-side build is still running; only happens when writers race it
+        build_all()
+    end
+end
+local function sync_ttl()
+    local ttl = redis.call('PTTL', KEYS[1])
+    for i = 2, 4 do
+        if ttl > 0 then redis.call('PEXPIRE', KEYS[i], ttl) else redis.call('PERSIST', KEYS[i]) end
+    end
+end
+"""
+
+# KEYS: list, members, keys, flag. 在脚本内遍历整个列表, 仅在客户端分页构建多次失败时使用
+LUA_INDEX_BUILD = _LUA_INDEX_STATE + """
+if redis.call('GET', KEYS[4]) == '1' then return 0 end
+build_all()
+sync_ttl()
+return redis.call('LLEN', KEYS[1])
+"""
+
+# KEYS: list, members_build, keys_build; ARGV: 一页列表元素
+LUA_INDEX_PAGE = _LUA_INDEX_HELPERS + """
+for i = 1, #ARGV do index_update(ARGV[i], 1) end
+return #ARGV
+"""
+
+# KEYS: list, members, keys, flag, members_build, keys_build; ARGV: 已索引的元素个数
+# 构建期间列表被脚本改写(flag 已被置位)或长度变化时放弃本次结果
+LUA_INDEX_COMMIT = _LUA_INDEX_STATE + """
+if redis.call('EXISTS', KEYS[4]) == 1 or redis.call('LLEN', KEYS[1]) ~= tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[5], KEYS[6])
+    if redis.call('GET', KEYS[4]) == '1' then return 1 end
+    return 0
+end
+redis.call('DEL', KEYS[2], KEYS[3])
+if redis.call('EXISTS', KEYS[5]) == 1 then redis.call('RENAME', KEYS[5], KEYS[2]) end
+if redis.call('EXISTS', KEYS[6]) == 1 then redis.call('RENAME', KEYS[6], KEYS[3]) end
+redis.call('SET', KEYS[4], 1)
+sync_ttl()
+return 1
+"""
+
+# KEYS: list, members, keys, flag; ARGV: value, unique(0/1), max(0 = unbounded), channel, message
+# 只有真正写入的值才会 PUBLISH, 被 unique 拒绝的重复值不会同步出去
+LUA_INDEX_PUSH = _LUA_INDEX_STATE + """
+ensure_ready()
+if ARGV[2] == '1' and redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then return 0 end
+local max = tonumber(ARGV[3])
+if max > 0 then
+    while redis.call('LLEN', KEYS[1]) >= max do
+        local popped = redis.call('LPOP', KEYS[1])
+        if not popped then break end
+        index_update(popped, -1)
+    end
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+index_update(ARGV[1], 1)
+sync_ttl()
+redis.call('PUBLISH', ARGV[4], ARGV[5])
+return 1
+"""
+
+# KEYS: list, members, keys, flag; ARGV: value
+LUA_INDEX_REMOVE = _LUA_INDEX_STATE + """
+ensure_ready()
+local removed = redis.call('LREM', KEYS[1], 0, ARGV[1])
+if removed > 0 then index_update(ARGV[1], -removed) end
+return removed
+"""
+
+
+class AutoPipeline:
+    # 超过 batch_size 条命令时自动 execute, 避免单个 pipeline 无限增长
+    def __init__(self, con, batch_size=500, transaction=False, keep_results=False):
+        self.pipe = con.pipeline(transaction=transaction)
+        self.batch_size = batch_size
+        self.keep_results = keep_results
+        self.queued = 0
+        self.results = []
+
+    def __getattr__(self, name):
+        command = getattr(self.pipe, name)
+
+        def queue_command(*args, **kwargs):
+            command(*args, **kwargs)
+            self.added()
+            return self
+        return queue_command
+
+    def script(self, script, keys, args):
+        script(keys=keys, args=args, client=self.pipe)
+        self.added()
+        return self
+
+    def added(self):
+        self.queued += 1
+        if self.queued >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.queued:
+            results = self.pipe.execute()
+            if self.keep_results:
+                self.results += results
+            self.queued = 0
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.pipe.reset()
+        return False
+
 class Redis(Base):
     __con = None
     __pipe__ = None
@@ -14,6 +183,9 @@ class Redis(Base):
     __process_subscribe = None
     __unserialize_length = 10000
     __base_table = []
+    __pipeline_batch_size = 500
+    __indexed_tables = set()
+    __scripts = None
 
     def __init__(self, args):
         pass
@@ -56,6 +228,52 @@ class Redis(Base):
         self.__pipe__ = self.__con__.pipeline()
         return self.__pipe__
 
+    def auto_pipeline(self, batch_size=None):
+        return AutoPipeline(self.connect(), batch_size=batch_size or self.__pipeline_batch_size)
+
+    def get_script(self, name):
+        if self.__scripts is None:
+            con = self.connect()
+            self.__scripts = {
+                "build": con.register_script(LUA_INDEX_BUILD),
+                "page": con.register_script(LUA_INDEX_PAGE),
+                "commit": con.register_script(LUA_INDEX_COMMIT),
+                "push": con.register_script(LUA_INDEX_PUSH),
+                "remove": con.register_script(LUA_INDEX_REMOVE),
+            }
+        return self.__scripts[name]
+
+    def get_index_keys(self, tabname):
+        return [tabname, f"{tabname}:__members", f"{tabname}:__keys", f"{tabname}:__indexed"]
+
+    def ensure_index(self, tabname, attempts=3):
+        if tabname in self.__indexed_tables:
+            return
+        if self.__con__.get(f"{tabname}:__indexed") not in (b"1", "1"):
+            for _ in range(attempts):
+                if self.build_index(tabname):
+                    break
+            else:
+                # 列表一直在被改写, 退回到服务端一次性构建
+                self.get_script("build")(keys=self.get_index_keys(tabname))
+        self.__indexed_tables.add(tabname)
+
+    def build_index(self, tabname, page_size=INDEX_PAGE_SIZE):
+        # 分页读取列表写入临时索引, 每个脚本调用只处理一页, 不会长时间阻塞 Redis
+        con = self.__con__
+        keys = self.get_index_keys(tabname)
+        staging = [f"{tabname}:__members_build", f"{tabname}:__keys_build"]
+        con.delete(keys[3], *staging)
+        page = self.get_script("page")
+        indexed = 0
+        while True:
+            items = con.lrange(tabname, indexed, indexed + page_size - 1)
+            if not items:
+                break
+            page(keys=[tabname] + staging, args=items)
+            indexed += len(items)
+        return bool(self.get_script("commit")(keys=keys + staging, args=[indexed]))
+
     def exec(self):
         if not self.__pipe__:
             self.com_util.print_warn("Pipeline is not initialized. Call 'pipeline()' method first.")
@@ -67,16 +285,29 @@ class Redis(Base):
     def get_prefix_dbname(self, dbname):
         return f"{self.__db_prefix}{dbname}"
 
-    def get_tables(self):
-        return self.__con__.keys('*')
+    def get_tables(self, match="*", count=1000):
+        return [key for key in self.__con__.scan_iter(match=match, count=count) if not self.is_index_key(key)]
+
+    def is_index_key(self, key):
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        return key.endswith(INDEX_SUFFIXES)
 
     def is_table(self, tabname):
         return self.__con__.exists(tabname)
 
     def is_column(self, tabname,key, ):
-        elements = self.__con__.lrange(tabname, 0, -1)
-        deserialized_data = [json.loads(element) for element in elements]
-        return any(key in element for element in deserialized_data)
+        return self.index_contains(tabname, f"{tabname}:__keys", str(key))
+
+    def is_member(self, tabname, value):
+        value = self.com_string.json_tostring(value)
+        return self.index_contains(tabname, f"{tabname}:__members", value)
+
+    def index_contains(self, tabname, index_key, field):
+        self.ensure_index(tabname)
+        # 列表已被 DEL 或过期时, 残留的索引不算数
+        exists, found = self.__con__.pipeline(transaction=False).exists(tabname).hexists(index_key, field).execute()
+        return bool(exists and found)
 
     def get_table_type(self, tabname):
         return self.__con__.type(tabname)
@@ -94,23 +325,137 @@ class Redis(Base):
         if self.__process_subscribe != None:
             self.__process_subscribe(tabname,data)
 
-    def serialize_and_save(self, db_connection=None, output_file='backup.json'):
-        backup_data = {}
-        tables = self.get_tables()
-
-        for table in tables:
-            table_type = self.get_table_type(table)
-            if table_type == b'string':
-                backup_data[table] = self.__con__.get(table)
-            elif table_type == b'list':
-                backup_data[table] = self.__con__.lrange(table, 0, -1)
-            elif table_type == b'set':
-                backup_data[table] = list(self.__con__.smembers(table))
-            elif table_type == b'zset':
-                backup_data[table] = self.__con__.zrange(table, 0, -1, withscores=True)
-            elif table_type == b'hash':
-                backup_data[table] = self.__con__.hgetall(table)
-        serialized_data = json.dumps(backup_data)
+    def _open_backup(self, file_name, mode):
+        if file_name.endswith(".gz"):
+            return gzip.open(file_name, f"{mode}t", encoding="utf-8")
+        return open(file_name, mode, encoding="utf-8")
+
+    def _encode_value(self, value):
+        if isinstance(value, (list, tuple)):
+            return [self._encode_value(item) for item in value]
+        if isinstance(value, bytes):
+            try:
+                return value.decode("utf-8")
+            except UnicodeDecodeError:
+                return {"b64": base64.b64encode(value).decode("ascii")}
+        return value
+
+    def _decode_value(self, value):
+        if isinstance(value, dict):
+            return base64.b64decode(value["b64"])
+        return value
+
+    def _scan_collection(self, key, key_type, batch_size):
+        con = self.__con__
+        if key_type == b'list':
+            start = 0
+            while True:
+                items = con.lrange(key, start, start + batch_size - 1)
+                if not items:
+                    return
+                yield items
+                start += batch_size
+        if key_type == b'hash':
+            scan = con.hscan_iter(key, count=batch_size)
+        elif key_type == b'set':
+            scan = con.sscan_iter(key, count=batch_size)
+        elif key_type == b'zset':
+            scan = con.zscan_iter(key, count=batch_size)
+        else:
+            return
+        chunk = []
+        for item in scan:
+            chunk.append(list(item) if isinstance(item, tuple) else item)
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def serialize_and_save(self, db_connection=None, output_file='backup.ndjson.gz', batch_size=500):
+        # 流式备份: SCAN 遍历键, 分批 pipeline 读取, 每条记录一行写入文件
+        con = self.connect()
+        saved_keys = 0
+        with self._open_backup(output_file, "w") as f:
+            keys = []
+            for key in con.scan_iter(count=batch_size):
+                # 伴生索引不备份, 恢复后由 ensure_index 按列表内容重建
+                if self.is_index_key(key):
+                    continue
+                keys.append(key)
+                if len(keys) >= batch_size:
+                    saved_keys += self._serialize_keys(keys, f, batch_size)
+                    keys = []
+            if keys:
+                saved_keys += self._serialize_keys(keys, f, batch_size)
+        self.com_util.print_info(f"redis backup: {saved_keys} keys -> {output_file}")
+        return saved_keys
+
+    def _serialize_keys(self, keys, f, batch_size):
+        con = self.__con__
+        pipe = con.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+            pipe.pttl(key)
+        meta = pipe.execute()
+        key_types = dict(zip(keys, meta[0::2]))
+        ttls = dict(zip(keys, meta[1::2]))
+        strings = [key for key in keys if key_types[key] == b'string']
+        values = dict(zip(strings, con.mget(strings))) if strings else {}
+        saved = 0
+        for key in keys:
+            key_type = key_types[key]
+            record = {"key": self._encode_value(key), "type": key_type.decode(), "ttl": ttls[key]}
+            if key_type == b'string':
+                if values[key] is None:
+                    continue
+                record["value"] = self._encode_value(values[key])
+                f.write(json.dumps(record) + "\n")
+            elif key_type in (b'list', b'hash', b'set', b'zset'):
+                for part, chunk in enumerate(self._scan_collection(key, key_type, batch_size)):
+                    record["part"] = part
+                    record["value"] = self._encode_value(chunk)
+                    f.write(json.dumps(record) + "\n")
+            else:
+                continue
+            saved += 1
+        return saved
+
+    def load_and_restore(self, input_file='backup.ndjson.gz', batch_size=None):
+        con = self.connect()
+        restored_keys = 0
+        with self._open_backup(input_file, "r") as f, self.auto_pipeline(batch_size) as pipe:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = self._decode_value(record["key"])
+                if self.is_index_key(key):
+                    continue
+                key_type = record["type"]
+                items = record.get("value")
+                if record.get("part", 0) == 0:
+                    pipe.delete(key)
+                    if key_type == "list":
+                        # 旧的伴生索引与恢复后的列表不一致, 删除后下次访问时重建
+                        suffixes = INDEX_SUFFIXES if isinstance(key, bytes) else [s.decode() for s in INDEX_SUFFIXES]
+                        pipe.delete(*[key + suffix for suffix in suffixes])
+                    restored_keys += 1
+                if key_type == "string":
+                    pipe.set(key, self._decode_value(items))
+                elif key_type == "list" and items:
+                    pipe.rpush(key, *[self._decode_value(item) for item in items])
+                elif key_type == "set" and items:
+                    pipe.sadd(key, *[self._decode_value(item) for item in items])
+                elif key_type == "hash" and items:
+                    pipe.hset(key, mapping={self._decode_value(k): self._decode_value(v) for k, v in items})
+                elif key_type == "zset" and items:
+                    pipe.zadd(key, {self._decode_value(member): score for member, score in items})
+                if record.get("ttl", -1) > 0 and record.get("part", 0) == 0:
+                    pipe.pexpire(key, record["ttl"])
+        self.__indexed_tables.clear()
+        self.com_util.print_info(f"redis restore: {restored_keys} keys <- {input_file}")
+        return restored_keys
 
     def unserialize_maptables(self,input_str):
         parts = input_str.split(":")[1].split("->")
@@ -251,61 +596,52 @@ class Redis(Base):
             return
         if isinstance(data,str):
             data = [data]
-        pipe = self.get_pipeline()
-        for value in data:
-            # 如果值不是字符串，则使用 JSON 序列化
-            value = self.com_string.json_tostring(value)
-            if unique:
-                existing_values = self.__con__.lrange(tabname, 0, -1)
-                if value.encode('utf-8') in existing_values:
-                    continue
-            # 执行 pipeline
-            # 使用列表存储数据到 Redis
-            if max is not None:
-                current_length = self.__con__.llen(tabname)
-                if current_length >= max:
-                    pipe.lpop(tabname)
-            pipe.rpush(tabname, value)
-            self.publish_data(tabname,value)
-        pipe.execute()
+        self.ensure_index(tabname)
+        push = self.get_script("push")
+        keys = self.get_index_keys(tabname)
+        with self.auto_pipeline() as pipe:
+            for value in data:
+                # 如果值不是字符串，则使用 JSON 序列化
+                value = self.com_string.json_tostring(value)
+                # unique 与 max 在服务端脚本中判断, 无需拉取整个列表
+                pipe.script(push, keys, [value, 1 if unique else 0, max or 0, self.__publish_cannel,
+                                         self.publish_message(tabname, value)])
 
     def save_hash(self, tabname=None, data=None):
         if not tabname or not data or not isinstance(data, dict):
             self.com_util.print_warn("Invalid arguments: 'tabname' must be curses.pyc string and 'data' must be curses.pyc non-empty dictionary.")
             return
-        pipe = self.get_pipeline()
-        for key, value in data.items():
-            # 如果值不是字符串，则使用 JSON 序列化
-            value = self.com_string.json_tostring(value)
-            # 使用哈希存储数据到 Redis
-            # self.__con__.hset(tabname, key, value)
-            pipe.hset(tabname, value)
-            self.publish_data(tabname,value)
-        pipe.execute()
+        with self.auto_pipeline() as pipe:
+            for key, value in data.items():
+                # 如果值不是字符串，则使用 JSON 序列化
+                value = self.com_string.json_tostring(value)
+                # 使用哈希存储数据到 Redis
+                pipe.hset(tabname, key, value)
+                self.publish_data(tabname, value, pipe=pipe)
 
     def save_set(self, tabname=None, data=None):
         if not tabname or not data or not isinstance(data, dict):
             self.com_util.print_warn("Invalid arguments: 'tabname' must be curses.pyc string and 'data' must be curses.pyc non-empty dictionary.")
             return
-        pipe = self.get_pipeline()
-        for key, value in data.items():
-            # 创建二级表名
-            sub_table_name = f"{tabname}:{key}"
-            # 如果值不是字符串，则使用 JSON 序列化
-            value = self.com_string.json_tostring(value)
-            # 存储数据到 Redis
-            pipe.set(tabname, value)
-            self.publish_data(tabname,value)
-            # self.__con__.set(sub_table_name, value)
-        pipe.execute()
-
-    def publish_data(self,tabname,value):
+        with self.auto_pipeline() as pipe:
+            for key, value in data.items():
+                # 创建二级表名
+                sub_table_name = f"{tabname}:{key}"
+                # 如果值不是字符串，则使用 JSON 序列化
+                value = self.com_string.json_tostring(value)
+                # 存储数据到 Redis
+                pipe.set(sub_table_name, value)
+                self.publish_data(tabname, value, pipe=pipe)
+
+    def publish_message(self, tabname, value):
         publish_data = {
             "tabname":tabname,
             "data":value
         }
-        publish_data = self.com_string.json_tostring(publish_data)
-        self.__con__.publish(self.__publish_cannel, publish_data)
+        return self.com_string.json_tostring(publish_data)
+
+    def publish_data(self,tabname,value,pipe=None):
+        (pipe or self.__con__).publish(self.__publish_cannel, self.publish_message(tabname, value))
 
     def read(self, tabname=None, conditions=None, limit=(0, -1), select="*"):
         return self.read_list(tabname=tabname, conditions=conditions, limit=limit, select=select)
@@ -414,8 +750,9 @@ class Redis(Base):
             return
         # 将 value 转换为 JSON 字符串（如果需要）
         value = self.com_string.json_tostring(value)
-        # 从 Redis 列表中删除给定的值
-        self.__con__.lrem(tabname, count=0, value=value)
+        # 从 Redis 列表中删除给定的值, 同时更新伴生索引
+        self.ensure_index(tabname)
+        return self.get_script("remove")(keys=self.get_index_keys(tabname), args=[value])
 
     def delete(self, tabname, conditions, physical=False):
         if physical == True:
@@ -1,18 +1,52 @@
+import re
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from typing import Dict, List, Union, Tuple, Optional, Any
 from pycore.globalvers import appenv, appdir
 from pycore.utils_linux import file
-from pycore.dbmode.baseclass.dbtoolbase import DBToolBase
+from pycore.dbmode.baseclass.dbtoolbase import DBToolBase, cached_read, fts_key, invalidates_cache
+from pycore.dbmode.baseclass.sqlite_pool import SqlitePool
+
+# SQLITE_MAX_VARIABLE_NUMBER of builds before 3.32; newer ones allow 32766
+max_variables = 999
 
 class Sqlite(DBToolBase):
 
-    def __init__(self, appenv_or_dburl: str, config_file: Dict=None,debug:bool=False):
+    def __init__(self, appenv_or_dburl: str, config_file: Dict=None,debug:bool=False, pool_size: int = 0,
+                 cached_statements: int = 256, pragmas: Dict[str, str] = None, schema_ttl: float = 5.0):
         db_url = self.get_db_url_from_config(appenv_or_dburl)
         self.db_url = db_url
         self.config_file = config_file
         self.include_filter = []
         self.exclude_filter = []
         self.show_sql = debug
+        self._local = threading.local()
+        self.schema_ttl = schema_ttl
+        self._schema_lock = threading.RLock()
+        self._schema_cache = {}
+        self._schema_version = None
+        self._schema_checked_at = 0.0
+        self._virtual_tables = set()
+        self.pool = None
+        if pool_size and pool_size > 0:
+            self.pool = SqlitePool(db_url, pool_size=pool_size, cached_statements=cached_statements, pragmas=pragmas)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def is_pooled(self) -> bool:
+        return self.pool is not None
+
+    def close(self):
+        self._release()
+        if self.pool is not None:
+            self.pool.close()
 
     def set_debug(self,debug):
         self.show_sql = debug
@@ -28,7 +62,7 @@ class Sqlite(DBToolBase):
 
     def filter_tables(self, tables: List[str]) -> List[str]:
         system_tables = {'sqlite_sequence', 'sqlite_stat1', 'sqlite_stat2', 'sqlite_stat3', 'sqlite_stat4'}
-        filtered_tables = [table for table in tables if table not in system_tables]
+        filtered_tables = [table for table in tables if table not in system_tables and table not in self._virtual_tables]
 
         if self.include_filter:
             filtered_tables = [table for table in filtered_tables if table in self.include_filter]
@@ -43,123 +77,313 @@ class Sqlite(DBToolBase):
         except FileNotFoundError:
             return False
 
-    def _connect(self):
-        self.conn = sqlite3.connect(self.db_url)
-        self.cursor = self.conn.cursor()
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            started = time.perf_counter()
+            if self.pool is not None:
+                conn = self.pool.acquire()
+            else:
+                conn = sqlite3.connect(self.db_url)
+            if self.metrics is not None:
+                self.metrics.acquire(time.perf_counter() - started)
+            self._local.conn = conn
+        self._local.cursor = conn.cursor()
+        return conn
+
+    def _release(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is None:
+            return
+        if self.pool is not None:
+            self.pool.release(conn)
+        else:
+            conn.close()
 
     def _close(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
-        self.cursor = None
-        self.conn = None
+        cursor = getattr(self._local, "cursor", None)
+        if cursor:
+            cursor.close()
+        self._local.cursor = None
+        if not self.in_transaction():
+            self._release()
+
+    @contextmanager
+    def _side_connection(self):
+        # helper queries (pragmas, EXPLAIN) reuse the thread's open connection without
+        # touching its cursor; a connection is opened and released only if none is held
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            self._close()
+
+    def _attach_metrics(self):
+        if self.pool is not None:
+            self.pool.wait_observer = self.metrics.pool_wait if self.metrics is not None else None
+
+    def in_transaction(self) -> bool:
+        return getattr(self._local, "tx_depth", 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        depth = getattr(self._local, "tx_depth", 0)
+        conn = self._connect()
+        savepoint = f"sp_{depth}"
+        conn.execute("BEGIN" if depth == 0 else f"SAVEPOINT {savepoint}")
+        self._local.tx_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            if depth == 0:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            raise
+        else:
+            if depth == 0:
+                conn.commit()
+            else:
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+        finally:
+            self._local.tx_depth = depth
+            if depth == 0:
+                self._close()
+                self.flush_dirty_tables()
+
+    def batch(self):
+        return self.transaction()
 
     def _execute(self, sql: str, params: Union[Tuple, List[Tuple]] = (), many: bool = False):
-        self._connect()
+        conn = self._connect()
+        cursor = self._local.cursor
 
         if self.show_sql:
             print(sql)
-        if many:
-            self.cursor.executemany(sql, params)
-        else:
-            self.cursor.execute(sql, params)
-        self.conn.commit()
-        return self.cursor
+        started = time.perf_counter()
+        try:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.statement(sql, time.perf_counter() - started, error=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.statement(sql, time.perf_counter() - started, cursor.rowcount)
+        if self.slow_query_ms is not None:
+            self.check_slow_query(sql, params, started, many)
+        if sql.lstrip()[:6].upper() in ("CREATE", "DROP T", "DROP I", "DROP V", "ALTER "):
+            self.invalidate_schema()
+        if not self.in_transaction():
+            conn.commit()
+        return cursor
 
 
     def init_database(self, table_maps: Dict[str, Dict[str, Dict[str, Union[str, bool, Optional[str]]]]]):
         self.create_tables(table_maps)
 
+    def _insert_sql(self, tabname: str, columns: Tuple[str, ...]) -> str:
+        return self.cached_sql(("sqlite", "insert", tabname, columns),
+                               lambda: f"INSERT INTO {tabname} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})")
+
+    def _update_sql(self, tabname: str, columns: Tuple[str, ...], shape: Tuple) -> str:
+        return self.cached_sql(("sqlite", "update", tabname, columns, shape),
+                               lambda: f"UPDATE {tabname} SET {', '.join([f'{key} = ?' for key in columns])} "
+                                       f"WHERE {self.compile_conditions(shape, 'sqlite')}")
+
+    def _select_sql(self, tablename: str, select: str, shape: Tuple, sort: Tuple = (), limit: bool = False) -> str:
+        def build():
+            where = f" WHERE {self.compile_conditions(shape, 'sqlite')}" if shape else ""
+            limit_clause = " LIMIT ?, ?" if limit else ""
+            return f"SELECT {select} FROM {tablename}{where}{self.sort_clause(dict(sort))}{limit_clause}"
+        return self.cached_sql(("sqlite", "select", tablename, select, shape, sort, limit), build)
+
+    @invalidates_cache
     def insert_one(self, tabname: str, data: Dict, result_id: bool = True):
-        keys = ', '.join(data.keys())
-        question_marks = ', '.join(['?' for _ in data])
         values = tuple(data.values())
-        sql = f"INSERT INTO {tabname} ({keys}) VALUES ({question_marks})"
+        sql = self._insert_sql(tabname, tuple(data.keys()))
         cursor = self._execute(sql, values)
         self._close()
         if result_id:
             return cursor.lastrowid
 
+    @invalidates_cache
     def update_one(self, tabname: str, data: Dict, conditions: Dict):
-        set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
-        where_clause, values = self._build_conditions(conditions)
-        values = tuple(data.values()) + values
-        sql = f"UPDATE {tabname} SET {set_clause} WHERE {where_clause}"
+        shape = self.condition_shape(conditions or {})
+        values = tuple(data.values()) + self.condition_values(conditions or {}, shape)
+        sql = self._update_sql(tabname, tuple(data.keys()), shape)
         self._execute(sql, values)
         self._close()
 
-    def read_one(self, tablename: str, conditions: Dict = None, select: str = "*") -> Optional[Dict[str, Any]]:
-        where_clause, values = self._build_conditions(conditions)
-        sql = f"SELECT {select} FROM {tablename} WHERE {where_clause}" if where_clause else f"SELECT {select} FROM {tablename}"
+    @cached_read
+    def read_one(self, tablename: str, conditions: Dict = None, select: str = "*",
+                 include_deleted: bool = False) -> Optional[Dict[str, Any]]:
+        conditions = self.live_conditions(tablename, conditions, include_deleted)
+        shape = self.condition_shape(conditions or {})
+        values = self.condition_values(conditions or {}, shape)
+        sql = self._select_sql(tablename, select, shape)
         cursor = self._execute(sql, values)
         read_result = cursor.fetchone()
         result = {}
         if read_result:
-            read_result = [col[0] for col in cursor.description]
+            columns = [col[0] for col in cursor.description]
             result = dict(zip(columns, read_result))
+            self.record_rows_read(1)
         self._close()
         return result
 
+    @invalidates_cache
     def insert_many(self, tabname: str, data: List[Dict], result_id: bool = True):
         if not data:
             return
-        keys = ', '.join(data[0].keys())
-        question_marks = ', '.join(['?' for _ in data[0]])
         values = [tuple(d.values()) for d in data]
-        sql = f"INSERT INTO {tabname} ({keys}) VALUES ({question_marks})"
+        sql = self._insert_sql(tabname, tuple(data[0].keys()))
         cursor = self._execute(sql, values, many=True)
         result_id = cursor.lastrowid
         self._close()
         if result_id:
             return result_id
 
+    @invalidates_cache
     def update_many(self, tabname: str, data: List[Dict], conditions: Dict):
         if not data:
             return
-        set_clause = ', '.join([f"{key} = ?" for key in data[0].keys()])
-        where_clause, cond_values = self._build_conditions(conditions)
+        shape = self.condition_shape(conditions or {})
+        cond_values = self.condition_values(conditions or {}, shape)
         values = [tuple(d.values()) + cond_values for d in data]
-        sql = f"UPDATE {tabname} SET {set_clause} WHERE {where_clause}"
+        sql = self._update_sql(tabname, tuple(data[0].keys()), shape)
         self._execute(sql, values, many=True)
         self._close()
 
+    @invalidates_cache
+    def upsert_many(self, tabname: str, data: List[Dict], key_fields: Union[str, List[str]],
+                    chunk_size: int = 500) -> Dict[str, int]:
+        counts = {"inserted": 0, "updated": 0}
+        if not data:
+            return counts
+        key_fields = [key_fields] if isinstance(key_fields, str) else list(key_fields)
+        columns = tuple(data[0].keys())
+        conflict = ', '.join(key_fields)
+
+        def build():
+            update_columns = [col for col in columns if col not in key_fields]
+            if update_columns:
+                action = f"DO UPDATE SET {', '.join([f'{col} = excluded.{col}' for col in update_columns])}"
+            else:
+                action = "DO NOTHING"
+            return f"{self._insert_sql(tabname, columns)} ON CONFLICT({conflict}) {action}"
+        sql = self.cached_sql(("sqlite", "upsert", tabname, columns, tuple(key_fields)), build)
+        key_placeholder = f"({', '.join(['?' for _ in key_fields])})"
+        # the existence probe binds every key field of every row in the chunk
+        chunk_size = max(1, min(chunk_size, max_variables // len(key_fields)))
+        for chunk in self.chunked(data, chunk_size):
+            key_values = [tuple(row[field] for field in key_fields) for row in chunk]
+            exists_sql = (f"SELECT {conflict} FROM {tabname} WHERE ({conflict}) IN "
+                          f"(VALUES {', '.join([key_placeholder] * len(key_values))})")
+            with self.transaction():
+                cursor = self._execute(exists_sql, tuple(value for key in key_values for value in key))
+                existing = [tuple(row) for row in cursor.fetchall()]
+                self._execute(sql, [tuple(row[col] for col in columns) for row in chunk], many=True)
+                self._close()
+            inserted, updated = self.upsert_counts(chunk, key_fields, existing)
+            counts["inserted"] += inserted
+            counts["updated"] += updated
+        return counts
+
+    @cached_read
     def read_many(self, tablename: str, conditions: Dict = None, limit: Tuple[int, int] = (0, 1000),
-                  select: str = "*", sort: Dict[str, str] = None, print_sql: bool = False) -> List[Dict[str, Any]]:
-        where_clause, values = self._build_conditions(conditions)
-        limit_clause = f" LIMIT {limit[0]}, {limit[1]}"
-        sort_clause = ' ORDER BY ' + ', '.join([f"{key} {value}" for key, value in sort.items()]) if sort else ''
-        sql = f"SELECT {select} FROM {tablename} WHERE {where_clause}{sort_clause}{limit_clause}" if where_clause else f"SELECT {select} FROM {tablename}{sort_clause}{limit_clause}"
+                  select: str = "*", sort: Dict[str, str] = None, print_sql: bool = False,
+                  include_deleted: bool = False) -> List[Dict[str, Any]]:
+        conditions = self.live_conditions(tablename, conditions, include_deleted)
+        shape = self.condition_shape(conditions or {})
+        values = self.condition_values(conditions or {}, shape) + (limit[0], limit[1])
+        sql = self._select_sql(tablename, select, shape, tuple(sort.items()) if sort else (), limit=True)
         cursor = self._execute(sql, values)
         result = cursor.fetchall()
         columns = [col[0] for col in cursor.description]
         self._close()
+        self.record_rows_read(len(result))
         data = [dict(zip(columns, row)) for row in result]
         return data
 
+    def get_primary_key(self, tablename: str) -> str:
+        keys = [name for name, info in self.get_table(tablename).items() if info["primary_key"]]
+        return keys[0] if len(keys) == 1 else "rowid"
+
+    def iter_rows(self, tablename: str, conditions: Dict = None, batch_size: int = 1000, select: str = "*",
+                  key: str = None, row_type: str = "dict", after: Any = None, include_deleted: bool = False):
+        key = key or self.get_primary_key(tablename)
+        conditions = self.live_conditions(tablename, conditions, include_deleted)
+        shape = self.condition_shape(conditions or {})
+        values = self.condition_values(conditions or {}, shape)
+        first_sql = self._select_sql(tablename, f"{key}, {select}", shape, ((key, "ASC"),), limit=True)
+        next_sql = self._select_sql(tablename, f"{key}, {select}", shape + ((key, ">", 0),), ((key, "ASC"),), limit=True)
+        last_key = after
+        build_row = None
+        while True:
+            if last_key is None:
+                sql, params = first_sql, values + (0, batch_size)
+            else:
+                sql, params = next_sql, values + (last_key, 0, batch_size)
+            cursor = self._execute(sql, params)
+            rows = cursor.fetchmany(batch_size)
+            if build_row is None:
+                build_row = self.row_builder([col[0] for col in cursor.description][1:], row_type, tablename)
+            self._close()
+            self.record_rows_read(len(rows))
+            for row in rows:
+                yield build_row(row[1:])
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+
+    @invalidates_cache
     def delete(self, tabname: str, conditions: Dict = None, physical: bool = False):
-        where_clause, values = self._build_conditions(conditions)
+        shape = self.condition_shape(conditions or {})
+        values = self.condition_values(conditions or {}, shape)
         if physical:
-            sql = f"DELETE FROM {tabname} WHERE {where_clause}"
+            sql = self.cached_sql(("sqlite", "delete", tabname, shape),
+                                  lambda: f"DELETE FROM {tabname} WHERE {self.compile_conditions(shape, 'sqlite')}")
         else:
-            sql = f"UPDATE {tabname} SET deleted = 1 WHERE {where_clause}"
+            tombstone = self.tombstone_values(tabname)
+            sql = self._update_sql(tabname, tuple(tombstone.keys()), shape)
+            values = tuple(tombstone.values()) + values
         self._execute(sql, values)
         self._close()
 
+    def _purge_batch(self, tablename: str, cutoff: Optional[str], batch_size: int) -> int:
+        where = "deleted != 0 AND deleted_time < ?" if cutoff else "deleted != 0"
+        params = ((cutoff,) if cutoff else ()) + (batch_size,)
+        cursor = self._execute(f"DELETE FROM {tablename} WHERE rowid IN "
+                               f"(SELECT rowid FROM {tablename} WHERE {where} LIMIT ?)", params)
+        count = cursor.rowcount
+        self._close()
+        return count
+
+    def compact(self, tablename: str = None):
+        # VACUUM rewrites the whole file and cannot run inside a transaction
+        if self.in_transaction():
+            raise sqlite3.OperationalError("compact() cannot run inside a transaction.")
+        self._execute("VACUUM")
+        self._execute("PRAGMA optimize")
+        self._close()
+
     def filter_query(self, query_obj, table_class, conditions: Dict = None):
         pass
 
     def get_session(self):
-        self._connect()
-        return self.conn
+        return self._connect()
 
-    def get_table(self, tabname: str) -> Dict[str, Dict[str, Union[int, str, bool, Optional[str]]]]:
-        sql = f"PRAGMA table_xinfo({tabname})"
-        cursor = self._execute(sql)
-        columns = cursor.fetchall()
-        self._close()
-
-        result = {
+    def _column_map(self, columns: List[Tuple]) -> Dict[str, Dict[str, Union[int, str, bool, Optional[str]]]]:
+        return {
             col[1]: {
                 "cid": col[0],
                 "name": col[1],
@@ -170,15 +394,46 @@ class Sqlite(DBToolBase):
                 "hidden": bool(col[6])
             } for col in columns
         }
-        return result
+
+    def invalidate_schema(self):
+        with self._schema_lock:
+            self._schema_cache = {}
+            self._schema_version = None
+            self._schema_checked_at = 0.0
+
+    def _load_schema(self) -> Dict[str, Dict[str, Dict[str, Union[int, str, bool, Optional[str]]]]]:
+        with self._schema_lock:
+            now = time.monotonic()
+            loaded = self._schema_version is not None
+            if loaded and now - self._schema_checked_at < self.schema_ttl:
+                return self._schema_cache
+            cursor = self._execute("PRAGMA schema_version")
+            version = cursor.fetchone()[0]
+            if not loaded or version != self._schema_version:
+                cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table'")
+                rows = cursor.fetchall()
+                tables = [row[0] for row in rows]
+                virtual = {name for name, sql in rows if (sql or "").upper().startswith("CREATE VIRTUAL TABLE")}
+                shadow = {f"{name}_{suffix}" for name in virtual
+                          for suffix in ("data", "idx", "content", "docsize", "config")}
+                self._virtual_tables = virtual | shadow
+                schema = {}
+                for table in tables:
+                    cursor.execute(f'PRAGMA table_xinfo("{table}")')
+                    schema[table] = self._column_map(cursor.fetchall())
+                self._schema_cache = schema
+                self._schema_version = version
+            self._close()
+            self._schema_checked_at = now
+            return self._schema_cache
+
+    def get_table(self, tabname: str) -> Dict[str, Dict[str, Union[int, str, bool, Optional[str]]]]:
+        return self._load_schema().get(tabname, {})
 
     def get_tablemaps(self) -> Dict[str, Dict[str, Dict[str, Union[str, bool, Optional[str]]]]]:
-        sql = "SELECT name FROM sqlite_master WHERE type='table'"
-        cursor = self._execute(sql)
-        tables = [row[0] for row in cursor.fetchall()]
-        tables = self.filter_tables(tables)
-        table_maps = {table: self.get_table(table) for table in tables}
-        self._close()
+        schema = self._load_schema()
+        tables = self.filter_tables(list(schema.keys()))
+        table_maps = {table: schema[table] for table in tables}
         return table_maps
 
     def show_tablemap(self):
@@ -191,10 +446,13 @@ class Sqlite(DBToolBase):
     def create_table(self, tablename: str, fields: Dict[str, Dict[str, Union[int, str, bool, Optional[str]]]]):
         if self.table_exists(tablename):
             self.info(f"Table '{tablename}' already exists. Skipping creation.")
+            self.ensure_indexes(tablename, fields)
+            if fields.get(fts_key):
+                self.create_fts(tablename, **fields[fts_key])
             return
 
         columns = []
-        for name, info in fields.items():
+        for name, info in self.table_fields(fields).items():
             column_def = f"{name} {info['type']}"
             if info.get('primary_key'):
                 column_def += " PRIMARY KEY AUTOINCREMENT"
@@ -208,23 +466,134 @@ class Sqlite(DBToolBase):
         self._execute(sql)
         self._close()
         self.success(f"Table '{tablename}' created successfully.")
+        self.ensure_indexes(tablename, fields)
+        if fields.get(fts_key):
+            self.create_fts(tablename, **fields[fts_key])
+
+    def get_indexes(self, tablename: str) -> Dict[str, Dict[str, Any]]:
+        # explicitly created indexes only (origin 'c'); PRIMARY KEY/UNIQUE constraints are left alone
+        indexes = {}
+        with self._side_connection() as conn:
+            for row in conn.execute(f"PRAGMA index_list({tablename})").fetchall():
+                name, unique, origin, partial = row[1], row[2], row[3], row[4]
+                if origin != "c":
+                    continue
+                columns = tuple(info[2] for info in conn.execute(f"PRAGMA index_info({name})").fetchall())
+                indexes[name] = {"columns": columns, "unique": bool(unique), "partial": bool(partial)}
+        return indexes
+
+    def create_index(self, tablename: str, index: Dict[str, Any]):
+        unique = "UNIQUE " if index.get("unique") else ""
+        sql = f"CREATE {unique}INDEX IF NOT EXISTS {index['name']} ON {tablename} ({', '.join(index['columns'])})"
+        if index.get("where"):
+            sql += f" WHERE {index['where']}"
+        self._execute(sql)
+        self._close()
+
+    def drop_index(self, tablename: str, name: str):
+        self._execute(f"DROP INDEX IF EXISTS {name}")
+        self._close()
+
+    def get_fts_table(self, tablename: str) -> str:
+        return f"{tablename}_fts"
+
+    def create_fts(self, tablename: str, columns: List[str], tokenize: str = "unicode61", prefix: List[int] = None,
+                   fts_table: str = None) -> bool:
+        """
+        External-content FTS5 index over `columns` of `tablename`, kept in sync by triggers.
+        tokenize="trigram" allows substring matching (what LIKE '%x%' was used for);
+        prefix=[2, 3] adds prefix indexes so 'ab*' queries stay fast.
+        Returns False if the FTS table already exists.
+        """
+        fts_table = fts_table or self.get_fts_table(tablename)
+        if fts_table in self._load_schema():
+            return False
+        rowid = self.get_primary_key(tablename)
+        column_list = ", ".join(columns)
+        options = [f"content='{tablename}'", f"content_rowid='{rowid}'", f"tokenize='{tokenize}'"]
+        if prefix:
+            options.append(f"prefix='{' '.join(str(size) for size in prefix)}'")
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        delete_old = (f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+                      f"VALUES ('delete', old.{rowid}, {old_values});")
+        insert_new = f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.{rowid}, {new_values});"
+        with self.transaction():
+            self._execute(f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_list}, {', '.join(options)})")
+            self._execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {tablename} "
+                          f"BEGIN {insert_new} END")
+            self._execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {tablename} "
+                          f"BEGIN {delete_old} END")
+            self._execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} "
+                          f"ON {tablename} BEGIN {delete_old} {insert_new} END")
+            self._execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+            self._close()
+        self.success(f"FTS table '{fts_table}' created for {tablename}({column_list}).")
+        return True
+
+    def drop_fts(self, tablename: str, fts_table: str = None):
+        fts_table = fts_table or self.get_fts_table(tablename)
+        with self.transaction():
+            for suffix in ("ai", "ad", "au"):
+                self._execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+            self._execute(f"DROP TABLE IF EXISTS {fts_table}")
+            self._close()
+
+    def fts_query(self, text: str, prefix: bool = False) -> str:
+        # plain user input -> FTS5 query: every term quoted (so '-', ':' etc. are literal), all required
+        terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+        if prefix and terms:
+            terms[-1] += "*"
+        return " ".join(terms)
+
+    def search(self, tablename: str, query: str, limit: int = 20, select: str = "*", prefix: bool = False,
+               raw: bool = False, weights: List[float] = None, fts_table: str = None) -> List[Dict[str, Any]]:
+        """
+        Ranked full-text search via the table's FTS5 mirror (best match first, bm25 in `rank`).
+        query is plain text unless raw=True (FTS5 syntax: NEAR, OR, column:term, ...).
+        """
+        fts_table = fts_table or self.get_fts_table(tablename)
+        match = query if raw else self.fts_query(query, prefix=prefix)
+        if not match:
+            return []
+        rowid = self.get_primary_key(tablename)
+        bm25 = f"bm25({fts_table}{''.join(f', {weight}' for weight in weights or ())})"
+        columns = ", ".join(f"t.{column.strip()}" for column in select.split(",")) if select != "*" else "t.*"
+        sql = (f"SELECT {columns}, {bm25} AS rank FROM {fts_table} JOIN {tablename} t ON t.{rowid} = {fts_table}.rowid "
+               f"WHERE {fts_table} MATCH ? ORDER BY rank LIMIT ?")
+        cursor = self._execute(sql, (match, limit))
+        names = [col[0] for col in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        self._close()
+        self.record_rows_read(len(rows))
+        return rows
+
+    def explain(self, sql: str, params: Union[Tuple, Dict] = ()) -> List[str]:
+        with self._side_connection() as conn:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[3] for row in rows]
+
+    def plan_scans(self, plan: List[str]) -> List[str]:
+        tables = []
+        for detail in plan:
+            match = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+            if match and "USING" not in detail:
+                tables.append(match.group(1))
+        return tables
 
     def create_tables(self, table_maps: Dict[str, Dict[str, Dict[str, Union[int, str, bool, Optional[str]]]]]):
         for tablename, fields in table_maps.items():
             self.create_table(tablename, fields)
 
 
+    @invalidates_cache
     def drop_table(self, tablename: str):
         sql = f"DROP TABLE IF EXISTS {tablename}"
         self._execute(sql)
         self._close()
 
     def table_exists(self, tablename: str) -> bool:
-        sql = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{tablename}'"
-        cursor = self._execute(sql)
-        is_table = bool(cursor.fetchone())
-        self._close()
-        return is_table
+        return tablename in self._load_schema()
 
     def migrate_data(self, origin_db,target_db):
         super().migrate_data(origin_db,target_db)
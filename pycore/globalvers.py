@@ -14,6 +14,17 @@ appname_env = env.get_env("APP_NAME")
 appname = appname_arg if appname_arg else appname_env
 appdir = os.path.join(rootdir, 'apps', appname)
 appenv = Env(appdir)
-sysid = src.get_system_id()
-systoken = src.get_system_token()
+_lazy_values = {
+    "sysid": src.get_system_id,
+    "systoken": src.get_system_token,
+}
+
+
+def __getattr__(name):
+    # sysid/systoken need platform probing, so compute them on first use only
+    if name in _lazy_values:
+        value = _lazy_values[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
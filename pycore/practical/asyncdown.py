@@ -0,0 +1,190 @@
+import asyncio
+import inspect
+import os
+import random
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+import httpx
+from pycore.base.base import Base
+
+retry_status_codes = (408, 425, 429, 500, 502, 503, 504)
+
+
+class AsyncDown(Base):
+    """
+    asyncio/httpx download engine: one keep-alive client, a global and a per-host
+    concurrency limit, bodies streamed to disk in chunks, exponential backoff.
+
+    on_event(event) is called (sync or async) with dicts whose "type" is
+    "start", "progress", "retry", "done" or "error".
+    """
+
+    def __init__(self, concurrency: int = 32, per_host: int = 6, retries: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 30.0, timeout: float = 60.0, chunk_size: int = 64 * 1024,
+                 progress_every: int = 1024 * 1024, headers: Dict[str, str] = None, http2: bool = False,
+                 save_path_for: Callable[[str], str] = None):
+        self.concurrency = max(1, int(concurrency))
+        self.per_host = max(1, int(per_host))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.progress_every = progress_every
+        self.headers = headers or {}
+        self.http2 = http2
+        self.save_path_for = save_path_for or (lambda url: os.path.basename(urlparse(url).path) or "index.html")
+
+    def normalize(self, item: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        if isinstance(item, str):
+            item = {"url": item}
+        item = dict(item)
+        item.setdefault("overwrite", True)
+        item.setdefault("extract", False)
+        if not item.get("save_filename"):
+            item["save_filename"] = item.get("save_path") or self.save_path_for(item["url"])
+        return item
+
+    def run(self, items: Iterable[Union[str, Dict[str, Any]]], on_event: Callable = None) -> List[Dict[str, Any]]:
+        """Blocking: download everything and return one result per item, in order."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.download(items, on_event))
+        # called from inside an event loop: run on a private loop in a worker thread
+        return self.start(items, on_event).result()
+
+    def start(self, items: Iterable[Union[str, Dict[str, Any]]], on_event: Callable = None) -> Future:
+        """Non-blocking: run the downloads on a background thread; the Future resolves to the results."""
+        future = Future()
+        items = list(items)
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(asyncio.run(self.download(items, on_event)))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="asyncdown", daemon=True).start()
+        return future
+
+    async def download(self, items: Iterable[Union[str, Dict[str, Any]]], on_event: Callable = None) -> List[Dict]:
+        items = list(items)
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits,
+                                     follow_redirects=True, http2=self.http2) as client:
+            async def guarded(item):
+                try:
+                    item = self.normalize(item)
+                    host = urlparse(item["url"]).netloc
+                    host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+                    # host slot first, so requests queued for one busy host don't hold global slots
+                    async with host_limit, limit:
+                        return await self.fetch(client, item, on_event)
+                except Exception as e:
+                    # one bad item (e.g. a malformed URL) must not fail the whole gather
+                    return await self._fail(item.get("url") if isinstance(item, dict) else item, e, on_event)
+            return await asyncio.gather(*[guarded(item) for item in items])
+
+    async def fetch(self, client: httpx.AsyncClient, item: Dict[str, Any], on_event: Callable = None) -> Dict:
+        url = item["url"]
+        save_filename = item["save_filename"]
+        if not item["overwrite"] and os.path.isfile(save_filename) and os.path.getsize(save_filename) > 0:
+            return await self._finish(item, save_filename, os.path.getsize(save_filename), "skipped", on_event)
+        await self._emit(on_event, {"type": "start", "url": url, "save_filename": save_filename})
+        attempt = 0
+        while True:
+            try:
+                size = await self._stream_to_file(client, url, save_filename, on_event)
+                return await self._finish(item, save_filename, size, "ok", on_event)
+            except (httpx.HTTPError, httpx.InvalidURL, httpx.StreamError) as e:
+                delay = self._retry_delay(e, attempt) if self._is_transient(e) else None
+                if delay is None:
+                    return await self._fail(url, e, on_event)
+                attempt += 1
+                await self._emit(on_event, {"type": "retry", "url": url, "attempt": attempt, "delay": delay,
+                                            "error": str(e)})
+                await asyncio.sleep(delay)
+            except OSError as e:
+                # disk full, permissions, a bad save path: not worth a retry, and must not fail the whole batch
+                return await self._fail(url, e, on_event)
+
+    async def _stream_to_file(self, client: httpx.AsyncClient, url: str, save_filename: str,
+                              on_event: Callable = None) -> int:
+        os.makedirs(os.path.dirname(os.path.abspath(save_filename)), exist_ok=True)
+        part_file = f"{save_filename}.part"
+        received = 0
+        reported = 0
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            total = int(response.headers.get("content-length") or 0) or None
+            try:
+                with open(part_file, "wb") as f:
+                    async for chunk in response.aiter_bytes(self.chunk_size):
+                        f.write(chunk)
+                        received += len(chunk)
+                        if on_event is not None and received - reported >= self.progress_every:
+                            reported = received
+                            await self._emit(on_event, {"type": "progress", "url": url, "bytes": received,
+                                                        "total": total})
+            except BaseException:
+                if os.path.exists(part_file):
+                    os.remove(part_file)
+                raise
+        os.replace(part_file, save_filename)
+        return received
+
+    def _is_transient(self, error: Exception) -> bool:
+        # timeouts, dropped connections and retryable status codes; a bad URL, scheme,
+        # redirect loop or undecodable body fails the same way every time
+        if isinstance(error, httpx.UnsupportedProtocol):
+            return False
+        return isinstance(error, (httpx.TransportError, httpx.HTTPStatusError))
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        if attempt >= self.retries:
+            return None
+        retry_after = None
+        if isinstance(error, httpx.HTTPStatusError):
+            if error.response.status_code not in retry_status_codes:
+                return None
+            header = error.response.headers.get("retry-after", "")
+            retry_after = float(header) if header.isdigit() else None
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+        # a huge Retry-After would otherwise park the slot for hours
+        return max(delay, min(retry_after or 0, self.max_backoff))
+
+    async def _finish(self, item: Dict[str, Any], save_filename: str, size: int, status: str,
+                      on_event: Callable = None) -> Dict[str, Any]:
+        result_filename = save_filename
+        if item["extract"]:
+            loop = asyncio.get_running_loop()
+            try:
+                from pycore.utils import file
+                result_filename = await loop.run_in_executor(None, file.file_extract, save_filename)
+            except Exception as e:
+                return await self._fail(item["url"], e, on_event)
+        result = {"url": item["url"], "save_filename": result_filename, "content_len": size, "status": status}
+        await self._emit(on_event, {"type": "done", **result})
+        return result
+
+    async def _fail(self, url: str, error: Exception, on_event: Callable = None) -> Dict[str, Any]:
+        result = {"url": url, "save_filename": None, "content_len": 0, "status": "error", "error": str(error)}
+        await self._emit(on_event, {"type": "error", **result})
+        return result
+
+    async def _emit(self, on_event: Callable, event: Dict[str, Any]):
+        if on_event is None:
+            return
+        try:
+            outcome = on_event(event)
+            if inspect.isawaitable(outcome):
+                await outcome
+        except Exception as e:
+            self.warn(f"asyncdown: on_event failed for {event.get('type')}: {e}")
@@ -10,7 +10,6 @@ from pycore.base.base import Base
 from pycore.utils import file, http
 from queue import Queue
 
-threadQueue = None
 webdownQueue = None
 
 
@@ -88,44 +87,69 @@ class Down(Base):
         save_filename = file.dir_normal(save_filename)
         return save_filename
 
+    def get_async_down(self, concurrency=32, per_host=6, retries=5):
+        # httpx is only needed once something is actually downloaded
+        from pycore.practical.asyncdown import AsyncDown
+        return AsyncDown(concurrency=concurrency, per_host=per_host, retries=retries,
+                         headers={key: value for key, value in self.__header.items() if key != "Connection"},
+                         save_path_for=self.url_to_savename)
+
     def downs(self, tupes_or_list, save_filename=None, extract=False, overwrite=True, wait=False, callback=None,
-              info=True, no_thread=False):
-        global threadQueue
-        # downs 由多线程模块传给file_down处理,参数使用down_file的参数
+              info=True, no_thread=False, on_event=None, concurrency=32, per_host=6, retries=5):
+        """
+        Download through AsyncDown. Returns the result list when wait=True, otherwise a
+        concurrent.futures.Future that resolves to it (it used to return the thread pool's
+        result); no_thread=True still downloads one by one and returns {url: result}.
+        callback(result) runs once per url as it finishes; an item's own "callback" key wins.
+        """
         if type(tupes_or_list) != list:
             tupes_or_list = [tupes_or_list]
-        if threadQueue == None:
-            threadQueue = Queue()
 
-        no_thread_result = {}
+        items = []
+        callbacks = {}
         for url in tupes_or_list:
-            if type(url) == str:
-                urlli = {
-                    "url": url,
-                    "extract": extract,
-                    "overwrite": overwrite,
-                    "callback": callback,
-                }
-                if no_thread:
-                    down_result = self.down_file(urlli, overwrite=overwrite, callback=callback, extract=extract,
-                                                 info=info)
-                    no_thread_result[url] = down_result
-                else:
-                    urlli = self.set_down_url_default_property(urlli, extract=extract, overwrite=overwrite,
-                                                               callback=callback, save_filename=save_filename)
-                    threadQueue.put(urlli)
+            urlli = {"url": url} if type(url) == str else dict(url)
+            urlli = self.set_down_url_default_property(urlli, extract=extract, overwrite=overwrite, callback=callback,
+                                                       save_filename=save_filename if len(tupes_or_list) == 1 else None)
+            item_callback = urlli.pop("callback", None)
+            if item_callback is not None:
+                callbacks.setdefault(urlli["url"], []).append(item_callback)
+            if urlli.get("save_filename"):
+                urlli["save_filename"] = file.resolve_path(urlli["save_filename"], self._download_dir)
+            items.append(urlli)
 
         if no_thread:
-            return no_thread_result
-        else:
-            thread_args = {
-                "queue": threadQueue,
-                "info": info,
-                # "tasks_per_thread":,
-            }
-            result_list = self.com_thread.create_thread_pool("downs", args=thread_args, max_thread=30, wait=wait,
-                                                             info=info, callback=callback)
-            return result_list
+            results = {}
+            for item in items:
+                results[item["url"]] = self.down_file(item["url"], save_path=item.get("save_filename"),
+                                                      overwrite=item["overwrite"], extract=item["extract"], info=info)
+                self.call_item_callback(callbacks, results[item["url"]])
+            return results
+
+        def item_events(event):
+            # 每个 url 完成时调用它自己的 callback, 与原先线程池逐个回调的行为一致
+            if event["type"] == "done":
+                self.call_item_callback(callbacks, event)
+            if on_event is not None:
+                return on_event(event)
+
+        if info:
+            self.info(f"downs: {len(items)} urls, concurrency {concurrency}, per host {per_host}")
+        engine = self.get_async_down(concurrency=concurrency, per_host=per_host, retries=retries)
+        future = engine.start(items, on_event=item_events if callbacks else on_event)
+        if wait:
+            return future.result()
+        return future
+
+    def call_item_callback(self, callbacks, result):
+        pending = callbacks.get(result["url"])
+        if not pending:
+            return
+        item_callback = pending.pop(0)
+        try:
+            item_callback({key: value for key, value in result.items() if key != "type"})
+        except Exception as e:
+            self.warn(f"downs: callback failed for {result['url']}: {e}")
 
     def down_file(self, url, save_path=None, overwrite=False, extract=False, info=True):
         save_path = file.resolve_path(save_path, self._download_dir)
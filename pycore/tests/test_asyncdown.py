@@ -0,0 +1,35 @@
+import pytest
+
+httpx = pytest.importorskip("httpx")
+from pycore.practical import asyncdown  # noqa: E402
+
+
+def handler(request):
+    if request.url.path == "/loop":
+        return httpx.Response(302, headers={"location": "/loop"})
+    if request.url.path == "/busy":
+        return httpx.Response(503, headers={"retry-after": "86400"})
+    return httpx.Response(200, content=b"ok")
+
+
+@pytest.fixture
+def down(monkeypatch, tmp_path):
+    client = httpx.AsyncClient
+
+    def mock_client(*args, http2=False, **kwargs):
+        return client(*args, transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(asyncdown.httpx, "AsyncClient", mock_client)
+    return asyncdown.AsyncDown(retries=1, backoff=0.01, max_backoff=0.05,
+                               save_path_for=lambda url: str(tmp_path / url.rsplit("/", 1)[-1]))
+
+
+def test_bad_urls_fail_alone(down):
+    results = down.run(["http://a/loop", "http://[bad/x", "http://a/busy", "http://a/file.txt"])
+    assert [result["status"] for result in results] == ["error", "error", "error", "ok"]
+
+
+def test_retry_after_is_clamped(down):
+    events = []
+    down.run(["http://a/busy"], on_event=events.append)
+    assert [event["delay"] for event in events if event["type"] == "retry"] == [0.05]
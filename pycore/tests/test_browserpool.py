@@ -0,0 +1,88 @@
+import time
+import pytest
+from pycore.thread.browserpool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.current_window_handle = "base"
+        self.window_handles = ["base"]
+
+
+class FakeBrowser:
+    launched = []
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.driver = FakeDriver()
+        self.quit_called = False
+        FakeBrowser.launched.append(self)
+
+    def get_driver(self, **kwargs):
+        if self.fail:
+            raise RuntimeError(f"{self.name} did not start")
+        return self.driver
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def launched():
+    FakeBrowser.launched = []
+    yield FakeBrowser.launched
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_lease_recycles_after_max_uses(launched):
+    pool = BrowserPool(size=2, max_uses=2, factory=FakeBrowser).start()
+    for _ in range(4):
+        with pool.lease(timeout=5) as session:
+            assert session.browser in launched
+    # every session reached max_uses and was relaunched in the background
+    wait_until(lambda: pool.stats()["idle"] == 2 and pool.stats()["launching"] == 0)
+    stats = pool.stats()
+    assert stats["leases"] == 4 and stats["recycled"] == 2 and stats["busy"] == 0
+    assert sorted(session["session_id"] for session in stats["sessions"]) == [3, 4]
+    assert [browser.quit_called for browser in launched] == [True, True, False, False]
+    pool.close()
+    assert all(browser.quit_called for browser in launched)
+
+
+def test_failed_start_quits_launched_sessions_and_is_retried(launched):
+    failing = {"n": 1}
+
+    def factory(name):
+        fail = failing["n"] > 0
+        failing["n"] -= 1
+        return FakeBrowser(name, fail=fail)
+
+    pool = BrowserPool(size=2, factory=factory)
+    with pytest.raises(RuntimeError):
+        pool.start()
+    assert all(browser.quit_called for browser in launched) and pool.stats()["sessions"] == []
+    with pool.lease(timeout=5) as session:
+        assert not session.browser.quit_called
+    assert len(pool.stats()["sessions"]) == 2
+    pool.close()
+
+
+def test_lease_raises_once_every_relaunch_failed():
+    browsers = iter([FakeBrowser("ok")])
+    pool = BrowserPool(size=1, max_uses=1, factory=lambda name: next(browsers, None) or FakeBrowser(name, fail=True))
+    pool.relaunch_backoff = 0
+    pool.poll_interval = 0.05
+    pool.start()
+    with pool.lease(timeout=5):
+        pass
+    with pytest.raises(RuntimeError, match="no browser session left"):
+        with pool.lease():
+            pass
+    pool.close()
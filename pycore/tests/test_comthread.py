@@ -0,0 +1,55 @@
+import queue
+import threading
+from pycore.thread.comThread import ComThread
+
+
+def test_stop_wakes_idle_consumer():
+    tasks = queue.Queue()
+    worker = ComThread(target=lambda item: item, task=tasks, until_empty=False)
+    worker.start()
+    assert worker.running.wait(1)
+    worker.stop()
+    assert not worker.is_alive and tasks.qsize() == 0
+
+
+def test_close_stops_each_consumer_once():
+    tasks = queue.Queue()
+    workers = [ComThread(target=lambda item: item, task=tasks, until_empty=False) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for item in range(6):
+        tasks.put(item)
+    workers[0].close(consumers=3)
+    tasks.join()
+    for worker in workers:
+        worker.join(5)
+    assert not any(worker.is_alive for worker in workers)
+    assert sorted(item for worker in workers for item in worker.result(0)) == list(range(6))
+
+
+def test_stop_leaves_no_stop_task_for_next_consumer():
+    tasks = queue.Queue()
+    started, release = threading.Event(), threading.Event()
+
+    def slow(item):
+        started.set()
+        release.wait(5)
+        return item
+
+    worker = ComThread(target=slow, task=tasks, until_empty=False)
+    worker.start()
+    tasks.put(1)
+    assert started.wait(1)
+    # stop() while the worker is busy puts nothing on the shared queue
+    stopper = threading.Thread(target=worker.stop)
+    stopper.start()
+    while not worker.stop_flag.is_set():
+        pass
+    release.set()
+    stopper.join(5)
+    assert not stopper.is_alive() and tasks.qsize() == 0 and tasks.unfinished_tasks == 0
+    tasks.put(2)
+    next_worker = ComThread(target=lambda item: item * 10, task=tasks, until_empty=False)
+    next_worker.start()
+    next_worker.close()
+    assert next_worker.result(5) == [20]
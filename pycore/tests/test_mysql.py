@@ -0,0 +1,36 @@
+from pycore.dbmode.mysql import MySQL
+
+
+def make_db(tmp_path):
+    # the adapter runs on any SQLAlchemy URL; sqlite keeps the test free of a server. The tests
+    # pass include_deleted=True because the tombstone check runs SHOW FULL COLUMNS.
+    db = MySQL(f"sqlite:///{tmp_path / 'mysql.db'}")
+    db._execute("CREATE TABLE w (id INTEGER PRIMARY KEY, word TEXT, deleted INT DEFAULT 0)")
+    db.insert_many("w", [{"id": i, "word": f"w{i}"} for i in range(1, 21)])
+    return db
+
+
+def test_iter_rows_key_condition_across_batches(tmp_path):
+    db = make_db(tmp_path)
+    rows = list(db.iter_rows("w", {"id": "<15"}, batch_size=5, key="id", include_deleted=True))
+    assert [row["id"] for row in rows] == list(range(1, 15))
+
+
+def test_iter_rows_after(tmp_path):
+    db = make_db(tmp_path)
+    rows = list(db.iter_rows("w", {"id": ">=3"}, batch_size=4, key="id", after=10,
+                              include_deleted=True))
+    assert [row["id"] for row in rows] == list(range(11, 21))
+
+
+def test_iter_rows_sql_is_valid_mysql(tmp_path):
+    from sqlalchemy import event
+    db = make_db(tmp_path)
+    statements = []
+    event.listen(db.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    rows = list(db.iter_rows("w", batch_size=15, key="id", include_deleted=True))
+    assert len(rows) == 20 and rows[0] == {"id": 1, "word": "w1", "deleted": 0}
+    selects = [statement for statement in statements if statement.startswith("SELECT")]
+    # a bare * after another column is a syntax error on MySQL
+    assert selects and all(statement.startswith("SELECT w.id AS _key, w.* FROM w") for statement in selects)
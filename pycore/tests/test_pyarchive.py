@@ -0,0 +1,33 @@
+import os
+import tarfile
+from pycore.thread import backup, pyarchive
+
+
+def make_tree(root):
+    source = root / "src"
+    source.mkdir()
+    (source / "a.txt").write_text("a" * 1000)
+    os.symlink("a.txt", source / "link.txt")
+    os.symlink("missing.txt", source / "dangling.txt")
+    return source
+
+
+def test_compress_keeps_symlinks(tmp_path):
+    source = make_tree(tmp_path)
+    out = str(tmp_path / "src.tar.xz")
+    result = pyarchive.compress(str(source), out)
+    assert result["bytes_in"] == 1000
+    with tarfile.open(out) as tar:
+        links = {member.name: member.linkname for member in tar if member.issym()}
+    assert links == {"src/link.txt": "a.txt", "src/dangling.txt": "missing.txt"}
+
+
+def test_backup_follows_links_and_skips_dangling(tmp_path):
+    source = make_tree(tmp_path)
+    archive = str(tmp_path / "bk" / "src.tar.xz")
+    result = backup.backup(str(source), archive)
+    assert result["skipped"] == ["dangling.txt"]
+    assert result["files"] == 2
+    backup.restore(archive, str(tmp_path / "restore"))
+    restored = tmp_path / "restore" / "link.txt"
+    assert not restored.is_symlink() and restored.read_text() == "a" * 1000
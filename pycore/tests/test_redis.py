@@ -0,0 +1,87 @@
+import json
+import pytest
+from pycore.dbmode.redis import Redis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class StringTool:
+    def json_tostring(self, value):
+        return value if isinstance(value, str) else json.dumps(value)
+
+
+class UtilTool:
+    def print_info(self, *args):
+        pass
+
+    def print_warn(self, *args):
+        pass
+
+
+@pytest.fixture
+def db():
+    # Redis normally takes com_string/com_util from the loaded global modules
+    redis_db = Redis(None)
+    redis_db.__dict__.update(__con__=fakeredis.FakeRedis(), com_string=StringTool(), com_util=UtilTool())
+    yield redis_db
+    redis_db._Redis__indexed_tables.clear()
+
+
+def published(pubsub):
+    messages = []
+    while True:
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+        if message is None:
+            return messages
+        messages.append(json.loads(message["data"])["data"])
+
+
+def test_save_list_unique_publishes_only_pushed_values(db):
+    pubsub = db.__con__.pubsub()
+    pubsub.subscribe("redis_data_sync")
+    pubsub.get_message(timeout=0.1)
+    db.save_list("L", ["a", "b", "a"], unique=True)
+    assert db.__con__.lrange("L", 0, -1) == [b"a", b"b"]
+    assert published(pubsub) == ["a", "b"]
+
+
+def test_restore_rebuilds_list_index(db, tmp_path):
+    backup_file = str(tmp_path / "backup.ndjson.gz")
+    # backed up before any index exists, so the backup carries no companion keys
+    db.__con__.rpush("L", "a", "b")
+    db.serialize_and_save(output_file=backup_file)
+    db.save_list("L", ["c"], unique=True)
+    db.load_and_restore(backup_file)
+    assert db.__con__.lrange("L", 0, -1) == [b"a", b"b"]
+    # "c" is gone from the list, so its stale index entry must not reject it
+    db.save_list("L", ["c", "a"], unique=True)
+    assert db.__con__.lrange("L", 0, -1) == [b"a", b"b", b"c"]
+    assert not db.is_member("L", "x") and db.is_member("L", "c")
+
+
+def test_index_reset_after_list_is_deleted(db):
+    db.save_list("L", ["a", "b"], unique=True)
+    db.__con__.delete("L")
+    assert not db.is_member("L", "a") and not db.is_column("L", "a")
+    db.save_list("L", ["a"], unique=True)
+    assert db.__con__.lrange("L", 0, -1) == [b"a"]
+    assert db.__con__.hgetall("L:__members") == {b"a": b"1"}
+
+
+def test_index_follows_list_ttl(db):
+    db.save_list("L", ["a"])
+    db.__con__.expire("L", 100)
+    db.save_list("L", ["b"])
+    for key in db.get_index_keys("L")[1:]:
+        assert 0 < db.__con__.ttl(key) <= 100
+
+
+def test_build_index_pages_through_list(db):
+    db.__con__.rpush("L", *[json.dumps({"k": i}) for i in range(25)] + ["a", "a"])
+    assert db.build_index("L", page_size=4)
+    assert db.__con__.hget("L:__members", "a") == b"2"
+    assert db.__con__.hget("L:__keys", "k") == b"25"
+    assert db.__con__.get("L:__indexed") == b"1"
+    assert not db.__con__.exists("L:__members_build", "L:__keys_build")
+    db.save_list("L", ["a"], unique=True)
+    assert db.__con__.llen("L") == 27
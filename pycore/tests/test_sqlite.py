@@ -0,0 +1,31 @@
+import sqlite3
+import pytest
+from pycore.dbmode.sqlite import Sqlite
+
+
+@pytest.mark.skipif(not hasattr(sqlite3, "SQLITE_LIMIT_VARIABLE_NUMBER"), reason="needs Connection.setlimit")
+def test_upsert_many_composite_key_within_old_variable_limit(tmp_path):
+    db = Sqlite(str(tmp_path / "u.db"))
+    db._execute("CREATE TABLE p (a INTEGER, b INTEGER, v TEXT, PRIMARY KEY (a, b))")
+    # the limit of sqlite builds before 3.32
+    db._connect().setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    rows = [{"a": i, "b": i % 7, "v": "x"} for i in range(600)]
+    assert db.upsert_many("p", rows, ["a", "b"]) == {"inserted": 600, "updated": 0}
+    assert db.upsert_many("p", rows, ["a", "b"]) == {"inserted": 0, "updated": 600}
+
+
+def test_rows_with_null_deleted_are_live(tmp_path):
+    db = Sqlite(str(tmp_path / "d.db"))
+    db._execute("CREATE TABLE w (id INTEGER PRIMARY KEY, word TEXT)")
+    db._execute("INSERT INTO w (word) VALUES ('old'), ('gone')")
+    # tombstones added to an existing table: the old rows get deleted = NULL
+    db._execute("ALTER TABLE w ADD COLUMN deleted INTEGER")
+    db._execute("CREATE INDEX idx_w_word ON w (word) WHERE (deleted = 0 OR deleted IS NULL)")
+    db.insert_one("w", {"word": "new", "deleted": 0})
+    db.delete("w", {"word": "gone"})
+    assert sorted(row["word"] for row in db.read_many("w")) == ["new", "old"]
+    assert db.read_one("w", {"word": "old"})["id"] == 1
+    assert [row["word"] for row in db.iter_rows("w", batch_size=1)] == ["old", "new"]
+    plan = db._execute("EXPLAIN QUERY PLAN SELECT * FROM w WHERE word = ? AND (deleted = 0 OR deleted IS NULL)",
+                       ("old",)).fetchall()
+    assert "idx_w_word" in str(plan)
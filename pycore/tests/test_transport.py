@@ -0,0 +1,21 @@
+import pytest
+from pycore.dbmode.sqlite import Sqlite
+from pycore.dbmode.baseclass.transport import Ttransport
+
+
+def test_transport_copies_by_primary_key(tmp_path):
+    source, target = Sqlite(str(tmp_path / "a.db")), Sqlite(str(tmp_path / "b.db"))
+    source._execute("CREATE TABLE w (id INTEGER PRIMARY KEY, word TEXT)")
+    source.insert_many("w", [{"id": i, "word": f"w{i}"} for i in range(1, 26)])
+    copied = Ttransport().transport(source, target, "w", step=10, checkpoint_file=str(tmp_path / "w.ckpt"))
+    assert copied == 25
+    assert len(target.read_many("w", include_deleted=True)) == 25
+
+
+def test_transport_rejects_table_without_key(tmp_path):
+    source, target = Sqlite(str(tmp_path / "a.db")), Sqlite(str(tmp_path / "b.db"))
+    source._execute("CREATE TABLE log (line TEXT, level TEXT)")
+    source.insert_many("log", [{"line": "x", "level": "info"}])
+    with pytest.raises(ValueError, match="primary key"):
+        Ttransport().transport(source, target, "log", checkpoint_file=str(tmp_path / "log.ckpt"))
+    assert not target.table_exists("log")
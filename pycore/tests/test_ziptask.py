@@ -0,0 +1,22 @@
+import threading
+from pycore.thread.ziptask import Ziptask
+
+
+def test_task_added_after_stop_is_not_stranded():
+    zt = Ziptask(max_jobs=1)
+    ran = []
+
+    def execute_single_task(task):
+        ran.append(task)
+        zt.task_done()
+
+    zt.execute_single_task = execute_single_task
+    with zt._condition:
+        # a dispatcher that has not yet seen stop() when the next task arrives
+        zt._dispatcher = threading.Thread(target=zt.run)
+        zt._dispatcher.start()
+        zt.stop()
+        zt._pending.append({"src": "a"})
+        zt.start_task()
+    assert zt.wait(5)
+    assert ran == [{"src": "a"}]
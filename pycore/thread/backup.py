@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+from pycore.thread import pyarchive
+
+# Incremental backups on top of pyarchive. The manifest next to the base archive
+# (<archive>.manifest.json) records, per file, size, mtime, content hash and the
+# archive/member holding its bytes, plus one entry per snapshot with what changed.
+# A backup packs only files whose content hash is not stored yet into a delta
+# archive; restore() replays the snapshots and pulls each file from its archive.
+manifest_version = 1
+hash_chunk_size = 1024 * 1024
+
+
+def manifest_path(archive: str) -> str:
+    return f"{archive}.manifest.json"
+
+
+def delta_path(archive: str, number: int, format: str) -> str:
+    suffix = pyarchive.format_suffixes[format]
+    stem = archive[:-len(suffix)] if archive.endswith(suffix) else archive
+    return f"{stem}.delta-{number:04d}{suffix}"
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(hash_chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(archive: str) -> Optional[Dict[str, Any]]:
+    path = manifest_path(archive)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(archive: str, manifest: Dict[str, Any]):
+    path = manifest_path(archive)
+    part_file = f"{path}.part"
+    with open(part_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(part_file, path)
+
+
+def scan(source: str, skipped: List[str] = None) -> Dict[str, os.stat_result]:
+    """
+    Relative path (always with "/") -> stat of every file under source, symlinks
+    resolved. Entries that cannot be stat'ed (dangling links) are appended to skipped.
+    """
+    files = {}
+    for root, dirs, names in os.walk(source):
+        dirs.sort()
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, source).replace(os.sep, "/")
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if skipped is not None:
+                    skipped.append(relative)
+                continue
+            files[relative] = stat
+    return files
+
+
+def backup(source: str, archive: str, format: str = "xz", threads: int = 1) -> Dict[str, Any]:
+    """
+    First call: full snapshot into archive. Later calls: a delta archive with the
+    files whose content is new since the last snapshot, or none if nothing changed.
+    Files whose size and mtime match the manifest are not read at all. Symlinks are
+    backed up as the content they point to; dangling ones are listed in "skipped".
+    """
+    manifest = load_manifest(archive) or {"version": manifest_version, "format": format, "files": {},
+                                          "snapshots": []}
+    format = manifest["format"]
+    previous = manifest["files"]
+    skipped = []
+    current = scan(source, skipped)
+    unchanged = {}
+    candidates = []
+    for relative, stat in current.items():
+        entry = previous.get(relative)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            unchanged[relative] = entry
+        else:
+            candidates.append(relative)
+
+    hashes = _hash_files(source, candidates, threads)
+    # content already stored anywhere (renamed, copied or touched files) is referenced, not packed again
+    stored = {entry["hash"]: entry for entry in previous.values()}
+    number = len(manifest["snapshots"])
+    target = archive if number == 0 else delta_path(archive, number, format)
+    archive_name = os.path.basename(target)
+    files = dict(unchanged)
+    changed = {}
+    members = []
+    for relative in candidates:
+        stat = current[relative]
+        file_hash_value = hashes[relative]
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": file_hash_value}
+        known = stored.get(file_hash_value)
+        if known is not None:
+            entry.update(archive=known["archive"], member=known["member"])
+        else:
+            entry.update(archive=archive_name, member=relative)
+            stored[file_hash_value] = entry
+            members.append((os.path.join(source, relative), relative))
+        files[relative] = entry
+        changed[relative] = entry
+    deleted = sorted(set(previous) - set(current))
+
+    result = {"snapshot": number, "archive": None, "files": len(current), "changed": len(changed),
+              "packed": len(members), "deleted": len(deleted), "skipped": skipped, "bytes_in": 0, "bytes_out": 0}
+    if members or number == 0:
+        # the manifest hashed what the links point to, so that is what gets packed
+        packed = pyarchive.compress_members(members, target, format, threads=threads, dereference=True)
+        result.update(archive=target, bytes_in=packed["bytes_in"], bytes_out=packed["bytes_out"])
+    if changed or deleted or number == 0:
+        manifest["files"] = files
+        manifest["snapshots"].append({"time": time.time(), "archive": result["archive"] and archive_name,
+                                      "changed": changed, "deleted": deleted})
+        save_manifest(archive, manifest)
+    else:
+        result["snapshot"] = number - 1
+    return result
+
+
+def snapshot_files(manifest: Dict[str, Any], snapshot: int = None) -> Dict[str, Dict[str, Any]]:
+    """The file table as of snapshot (default: the latest), replayed from the snapshot diffs."""
+    snapshots = manifest["snapshots"]
+    if snapshot is None or snapshot >= len(snapshots) - 1:
+        return manifest["files"]
+    if snapshot < 0:
+        raise ValueError(f"Snapshot {snapshot} does not exist.")
+    files = {}
+    for entry in snapshots[:snapshot + 1]:
+        files.update(entry["changed"])
+        for relative in entry["deleted"]:
+            files.pop(relative, None)
+    return files
+
+
+def restore(archive: str, out: str, snapshot: int = None) -> Dict[str, Any]:
+    """Rebuild the source tree as of snapshot under out, reading each archive once."""
+    manifest = load_manifest(archive)
+    if manifest is None:
+        raise ValueError(f"No backup manifest for {archive}.")
+    files = snapshot_files(manifest, snapshot)
+    wanted: Dict[str, Dict[str, List[str]]] = {}
+    for relative, entry in files.items():
+        wanted.setdefault(entry["archive"], {}).setdefault(entry["member"], []).append(relative)
+    folder = os.path.dirname(os.path.abspath(archive))
+    bytes_in = 0
+    bytes_out = 0
+    for archive_name, members in wanted.items():
+        path = os.path.join(folder, archive_name)
+        bytes_in += os.path.getsize(path)
+        for member, reader in pyarchive.iter_members(path):
+            targets = members.get(member)
+            if not targets:
+                continue
+            first = _safe_join(out, targets[0])
+            os.makedirs(os.path.dirname(first), exist_ok=True)
+            with open(first, "wb") as f:
+                shutil.copyfileobj(reader, f, hash_chunk_size)
+            for relative in targets[1:]:
+                target = _safe_join(out, relative)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(first, target)
+            for relative in targets:
+                entry = files[relative]
+                os.utime(_safe_join(out, relative), ns=(entry["mtime_ns"], entry["mtime_ns"]))
+                bytes_out += entry["size"]
+    return {"snapshot": len(manifest["snapshots"]) - 1 if snapshot is None else snapshot, "files": len(files),
+            "bytes_in": bytes_in, "bytes_out": bytes_out}
+
+
+def _safe_join(out: str, relative: str) -> str:
+    path = os.path.abspath(os.path.join(out, *relative.split("/")))
+    if os.path.commonpath([path, os.path.abspath(out)]) != os.path.abspath(out):
+        raise ValueError(f"Refusing to restore outside {out}: {relative}")
+    return path
+
+
+def _hash_files(source: str, relatives: List[str], threads: int) -> Dict[str, str]:
+    paths = [os.path.join(source, relative) for relative in relatives]
+    if threads > 1 and len(paths) > 1:
+        from pycore.thread.executor import Executor
+        with Executor(max_workers=threads, name="backup-hash") as executor:
+            return dict(zip(relatives, executor.map(file_hash, paths)))
+    return {relative: file_hash(path) for relative, path in zip(relatives, paths)}
@@ -0,0 +1,267 @@
+import itertools
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+from pycore.base.base import Base
+
+
+def selenium_factory(name: str):
+    # the Selenium wrapper pulls in selenium, lxml and webdriver_manager; only load it when a pool launches
+    from pycore._misc.com.selenium import Selenium
+    return Selenium(args=name)
+
+
+class BrowserSession:
+    """One launched browser. data is free for the caller, e.g. to remember which page is open."""
+
+    def __init__(self, session_id: int, browser: Any):
+        self.session_id = session_id
+        self.browser = browser
+        self.started = time.monotonic()
+        self.uses = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+        self.base_handle = None
+        self.data: Dict[str, Any] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        age = time.monotonic() - self.started
+        return {"session_id": self.session_id, "uses": self.uses, "errors": self.errors,
+                "age_seconds": round(age, 1), "busy_seconds": round(self.busy_seconds, 3),
+                "uses_per_minute": round(self.uses * 60 / age, 2) if age > 0 else 0.0}
+
+
+class BrowserPool(Base):
+    """
+    K pre-launched browsers shared by worker threads. lease() hands a session to
+    one thread at a time (a WebDriver is not safe to drive from two threads),
+    optionally on a fresh tab. A session is relaunched in the background after
+    max_uses leases, or when its driver stops answering after an error. If every
+    session is gone and no launch is pending, lease() raises instead of waiting.
+    """
+    poll_interval = 0.5
+    relaunch_backoff = 2
+
+    def __init__(self, size: int = 2, max_uses: int = 500, headless: bool = True, width: int = None,
+                 height: int = None, driver_type: str = "chrome", fresh_tab: bool = False,
+                 factory: Callable[[str], Any] = None, name: str = "browser-pool"):
+        self.size = max(1, int(size))
+        self.max_uses = max_uses
+        self.open_args = {"headless": headless, "width": width, "height": height, "driver_type": driver_type}
+        self.fresh_tab = fresh_tab
+        self.factory = factory or selenium_factory
+        self.name = name
+        self._idle = queue.Queue()
+        self._sessions: Dict[int, BrowserSession] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._launching = 0
+        self._waiting = 0
+        self._leases = 0
+        self._recycled = 0
+        self._executor = None
+
+    def start(self) -> "BrowserPool":
+        """Launch all sessions in parallel; returns once every browser is up."""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+            self._launching += self.size
+            if self._executor is None:
+                from pycore.thread.executor import Executor
+                self._executor = Executor(max_workers=self.size, name=self.name)
+        errors = []
+        for future in [self._executor.submit(self._launch_one) for _ in range(self.size)]:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            # a half-started pool: quit what did launch so the next lease() starts over
+            self._abort_start()
+            raise errors[0]
+        return self
+
+    @contextmanager
+    def lease(self, timeout: float = None) -> Iterator[BrowserSession]:
+        if not self._started:
+            self.start()
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed.")
+        with self._lock:
+            self._waiting += 1
+        try:
+            session = self._next_idle(timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        started = time.monotonic()
+        healthy = True
+        try:
+            if self.fresh_tab:
+                self._open_tab(session)
+            yield session
+        except Exception:
+            session.errors += 1
+            healthy = self._alive(session)
+            raise
+        finally:
+            if healthy and self.fresh_tab:
+                healthy = self._close_tab(session)
+            session.uses += 1
+            session.busy_seconds += time.monotonic() - started
+            with self._lock:
+                self._leases += 1
+            self._release(session, healthy)
+
+    @contextmanager
+    def borrow(self, owner: Any, attribute: str = "com_selenium", timeout: float = None) -> Iterator[BrowserSession]:
+        """lease() that also points owner.com_selenium at the session's browser, so thread code runs unchanged."""
+        with self.lease(timeout) as session:
+            own = owner.__dict__.get(attribute)
+            setattr(owner, attribute, session.browser)
+            try:
+                yield session
+            finally:
+                if own is None:
+                    # fall back to the shared module again (Base.__getattr__)
+                    owner.__dict__.pop(attribute, None)
+                else:
+                    setattr(owner, attribute, own)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions: List[BrowserSession] = list(self._sessions.values())
+            result = {"size": self.size, "idle": self._idle.qsize(), "waiting": self._waiting,
+                      "launching": self._launching, "leases": self._leases, "recycled": self._recycled}
+        result["busy"] = len(sessions) - result["idle"]
+        result["sessions"] = [session.stats() for session in sessions]
+        return result
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            sessions = list(self._sessions.values())
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(session)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.info(f"{self.name}: closed, {len(sessions)} session(s) were open.")
+
+    def _next_idle(self, timeout: float = None) -> BrowserSession:
+        # timed gets, so a pool whose every relaunch failed is noticed instead of waited on forever
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.monotonic())
+            try:
+                return self._idle.get(timeout=max(0, wait))
+            except queue.Empty:
+                pass
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed.")
+            with self._lock:
+                if not self._sessions and not self._launching:
+                    raise RuntimeError(f"{self.name} has no browser session left; every relaunch failed.")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No browser session free in {self.name} within {timeout}s.")
+
+    def _abort_start(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(session)
+        with self._lock:
+            self._started = False
+
+    def _release(self, session: BrowserSession, healthy: bool):
+        if self._closed:
+            self._quit(session)
+        elif not healthy or (self.max_uses and session.uses >= self.max_uses):
+            with self._lock:
+                self._recycled += 1
+                self._launching += 1
+            # relaunching takes seconds: do it off the releasing thread
+            self._executor.submit(self._recycle, session)
+        else:
+            self._idle.put(session)
+
+    def _recycle(self, session: BrowserSession, attempts: int = 3):
+        try:
+            self._quit(session)
+            for attempt in range(1, attempts + 1):
+                try:
+                    self._launch()
+                    return
+                except Exception as e:
+                    self.warn(f"{self.name}: relaunch {attempt}/{attempts} failed: {e}")
+                    time.sleep(attempt * self.relaunch_backoff)
+            self.error(f"{self.name}: running with one session less after {attempts} failed relaunches.")
+        finally:
+            with self._lock:
+                self._launching -= 1
+
+    def _launch_one(self):
+        try:
+            return self._launch()
+        finally:
+            with self._lock:
+                self._launching -= 1
+
+    def _launch(self):
+        session_id = next(self._ids)
+        browser = self.factory(f"{self.name}-{session_id}")
+        session = BrowserSession(session_id, browser)
+        try:
+            browser.get_driver(**self.open_args)
+            session.base_handle = browser.get_driver().current_window_handle
+        except Exception:
+            self._quit(session)
+            raise
+        with self._lock:
+            self._sessions[session_id] = session
+        if self._closed:
+            self._quit(session)
+        else:
+            self._idle.put(session)
+        return session
+
+    def _quit(self, session: BrowserSession):
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+        try:
+            session.browser.quit()
+        except Exception as e:
+            self.warn(f"{self.name}: quitting session {session.session_id} failed: {e}")
+
+    def _open_tab(self, session: BrowserSession):
+        driver = session.browser.get_driver()
+        driver.switch_to.new_window("tab")
+
+    def _close_tab(self, session: BrowserSession) -> bool:
+        try:
+            driver = session.browser.get_driver()
+            if driver.current_window_handle != session.base_handle:
+                driver.close()
+            driver.switch_to.window(session.base_handle)
+            return True
+        except Exception as e:
+            self.warn(f"{self.name}: session {session.session_id} lost its tab: {e}")
+            return False
+
+    def _alive(self, session: BrowserSession) -> bool:
+        try:
+            session.browser.get_driver().window_handles
+            return True
+        except Exception:
+            return False
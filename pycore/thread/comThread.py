@@ -1,17 +1,34 @@
 import queue
 import threading
 from pycore.base.base import Base
+from pycore.thread.executor import stop_task
 import uuid
 
 class ComThread(threading.Thread, Base):
-    def __init__(self, target, task=None, retry_task=False):
-        threading.Thread.__init__(self)
+    """
+    Runs target once, or target(item) for every item of the task Queue.
+
+    until_empty=True (the default) ends the thread once the queue is drained;
+    with until_empty=False it waits for more work and exits when it receives
+    stop_task (see close()) or, within poll_interval seconds, after stop().
+    run() can also be handed to an Executor.
+    """
+    poll_interval = 0.2
+
+    def __init__(self, target=None, task=None, retry_task=False, until_empty=True, args=None, group_queue=None,
+                 public_queue=None, thread_id=None, thread_name=None, daemon=False):
+        threading.Thread.__init__(self, name=thread_name, daemon=daemon)
         self.task = task
         self.target = target  # "cmd" or def
         self.retry_task = retry_task
+        self.until_empty = until_empty
+        self.args = args
         self.resultQueue = queue.Queue()
         self.is_alive = True
         self.stop_flag = threading.Event()
+        self.finished = threading.Event()
+        self.running = threading.Event()
+        self.runner = None
         self.subprocess = None
         self.thread_id = self.generate_id()
 
@@ -29,40 +46,43 @@ class ComThread(threading.Thread, Base):
     def generate_id(self):
         return str(uuid.uuid4())
 
+    def next_task(self):
+        if self.until_empty:
+            # get_nowait is atomic: no window between empty() and get() for another thread to win
+            try:
+                return self.task.get_nowait()
+            except queue.Empty:
+                return stop_task
+        # a timed get, so stop() is noticed without putting anything on the shared queue
+        while not self.stop_flag.is_set():
+            try:
+                args = self.task.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            if args is stop_task:
+                # close() puts one per consumer; each is taken exactly once
+                self.task.task_done()
+            return args
+        return stop_task
+
+    def run_task(self, args):
+        if self.target == "cmd":
+            if isinstance(args, dict):
+                return self.cmd(args.get('cmd'))
+            return self.cmd(args)
+        return self.target(args)
+
     def run(self):
         self.is_alive = True
-        if self.target is None:
-            return self.resultQueue
-        elif self.target == "cmd":
-            while not self.task.empty() and not self.stop_flag.is_set():
-                args = self.task.get()
-                if self.stop_flag.is_set():
-                    self.info("ComThread stopped.")
-                    break
-                elif isinstance(args, str) or isinstance(args, list):
-                    cmd = args
-                elif isinstance(args, dict):
-                    cmd = args.get('cmd')
-                else:
-                    cmd = args
-                result = self.cmd(cmd)
-                self.resultQueue.put(result)
-        else:
-            if self.task:
-                while not self.task.empty():
-                    if self.stop_flag.is_set():
-                        self.info("ComThread stopped.")
-                        break
-                    args = self.task.get()
-                    try:
-                        result = self.target(args)
-                    except Exception as e:
-                        self.error(f"Thread-com: {e}")
-                        if self.retry_task:
-                            self.task.put(args)
-                    else:
-                        self.resultQueue.put(result)
-                self.info("The tasks completes and the current thread ends")
+        self.finished.clear()
+        # run() may execute on an Executor worker rather than on this Thread
+        self.runner = threading.current_thread()
+        self.running.set()
+        try:
+            if self.target is None:
+                return self.resultQueue
+            elif self.task is not None:
+                self.run_tasks()
             else:
                 try:
                     result = self.target()
@@ -70,7 +90,30 @@ class ComThread(threading.Thread, Base):
                     self.error(f"Thread-com: {e}")
                 else:
                     self.resultQueue.put(result)
-        self.is_alive = False
+        finally:
+            self.running.clear()
+            self.is_alive = False
+            self.finished.set()
+
+    def run_tasks(self):
+        while not self.stop_flag.is_set():
+            args = self.next_task()
+            if args is stop_task:
+                break
+            try:
+                result = self.run_task(args)
+            except Exception as e:
+                self.error(f"Thread-com: {e}")
+                if self.retry_task:
+                    self.task.put(args)
+            else:
+                self.resultQueue.put(result)
+            finally:
+                self.task.task_done()
+        if self.stop_flag.is_set():
+            self.info("ComThread stopped.")
+        else:
+            self.info("The tasks completes and the current thread ends")
 
     def set(self, name, data):
         self.__dict__[name] = data
@@ -89,15 +132,22 @@ class ComThread(threading.Thread, Base):
         else:
             return True
 
-    def result(self):
-        while not self.done():
-            self.warn("Waiting for ComThread return.")
+    def result(self, timeout=None):
+        self.finished.wait(timeout)
         result_queue = []
         while not self.resultQueue.empty():
             result_queue.append(self.resultQueue.get())
         return result_queue
 
+    def close(self, consumers=1):
+        """Tell consumers blocked on the task queue (until_empty=False) to exit once it is drained."""
+        for _ in range(consumers):
+            self.task.put(stop_task)
+
     def stop(self):
         self.warn("Stopping ComThread...")
         self.stop_flag.set()
-        self.join()
+        if self.running.is_set() and self.runner is not threading.current_thread():
+            self.finished.wait()
+        if threading.Thread.is_alive(self) and threading.current_thread() is not self:
+            self.join()
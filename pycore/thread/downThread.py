@@ -1,4 +1,5 @@
 from pycore.base.base import Base
+import queue
 import threading
 
 threadLock = threading.Lock()
@@ -26,10 +27,10 @@ class DownThread(threading.Thread, Base):  # 继承父类threading.Thread
         self.__count = self.__queue.qsize()
 
     def get_task_item(self):
-        if self.__queue.qsize() > 0:
-            item = self.__queue.get()
-            return item
-        return None
+        try:
+            return self.__queue.get_nowait()
+        except queue.Empty:
+            return None
 
     def run(self):  # 把要执行的代码写到run函数里面 线程在创建后会直接运行run函数
         """
@@ -43,27 +44,18 @@ class DownThread(threading.Thread, Base):  # 继承父类threading.Thread
         :param override:
         :return:
         """
+        # 取出队列中的全部任务交给 AsyncDown 并发下载(重试与退避由 AsyncDown 处理)
+        items = []
         item = self.get_task_item()
         while item != None:
-            item = self.com_http.set_down_url_default_property(item)
-            result = self.error_redown(item)
+            items.append(item)
             item = self.get_task_item()
-            self.__resultList.append(result)
-            self.__count += 1
-
-    def error_redown(self, item, index=0):
-        try:
-            result = self.com_http.down_file(item, info=self.__info)
-            return result
-        except Exception as e:
-            if index > 10:
-                print(e)
-                self.com_util.print_danger(f"When the number of retries reaches {index}, give up the attempt.")
-                return None
-            self.com_util.print_danger(e)
-            self.com_util.print_warn(f"retrying down_file.")
-            index += 1
-            return self.error_redown(item, index)
+        if not items:
+            return
+        from pycore.practical.down import Down
+        results = Down().downs(items, wait=True, info=self.__info)
+        self.__resultList.extend(results)
+        self.__count += len(results)
 
     def done(self):
         if self.__queue.qsize() == 0:
@@ -0,0 +1,229 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator
+from pycore.base.base import Base
+
+# put on a task queue to retire exactly one consumer blocked in get()
+stop_task = object()
+
+
+def default_workers() -> int:
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class _PoolMixin:
+    max_workers = 1
+    max_queue = 0
+
+    def map(self, fn: Callable, iterable: Iterable, timeout: float = None) -> Iterator:
+        """
+        Results in input order. Submission is windowed, so a huge or endless
+        iterable never has more than max_workers + max_queue calls in flight.
+        """
+        window = deque()
+        limit = self.max_workers + (self.max_queue or self.max_workers)
+        for item in iterable:
+            window.append(self.submit(fn, item))
+            if len(window) >= limit:
+                yield window.popleft().result(timeout)
+        while window:
+            yield window.popleft().result(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False
+
+
+class Executor(_PoolMixin, Base):
+    """
+    Long-lived worker threads fed from one bounded queue. Workers block in get()
+    until work arrives and exit on stop_task; submit() blocks while the queue is
+    full, which is the backpressure for fast producers.
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, name: str = "executor",
+                 daemon: bool = True):
+        self.max_workers = max(1, int(max_workers or default_workers()))
+        # 0 means unbounded, as for queue.Queue
+        self.max_queue = self.max_workers * 4 if max_queue is None else max(0, int(max_queue))
+        self.name = name
+        self.daemon = daemon
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._workers = []
+        self._idle = threading.Semaphore(0)
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError(f"Executor {self.name} is shut down.")
+            self._adjust_workers()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def run_thread(self, thread: threading.Thread) -> Future:
+        """Run a thread object's run() on a pool worker instead of its own OS thread."""
+        return self.submit(thread.run)
+
+    def run_queue(self, target: Callable, tasks: queue.Queue, retry_task: bool = False,
+                  retries: int = 3) -> Future:
+        """
+        Drain a legacy task Queue through the pool: every item becomes target(item).
+        The returned Future resolves to the results, in completion order, once the
+        items that were queued have all been processed.
+        """
+        result = Future()
+
+        def call(item):
+            attempt = 0
+            while True:
+                try:
+                    return target(item)
+                except Exception as e:
+                    if not retry_task or attempt >= retries:
+                        raise
+                    attempt += 1
+                    self.warn(f"{self.name}: retry {attempt}/{retries} {item}: {e}")
+
+        def drain():
+            futures = []
+            while True:
+                try:
+                    item = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                futures.append(self.submit(call, item))
+            results = []
+            for future in futures:
+                error = future.exception()
+                if error is None:
+                    results.append(future.result())
+                else:
+                    self.error(f"{self.name}: {error}")
+            result.set_result(results)
+
+        # fed from a helper thread so a full pool queue never blocks the caller
+        threading.Thread(target=drain, name=f"{self.name}-feed", daemon=True).start()
+        return result
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        with self._lock:
+            if self._shutdown:
+                workers = list(self._workers)
+            else:
+                self._shutdown = True
+                workers = list(self._workers)
+                if cancel_futures:
+                    self._cancel_pending()
+                for _ in workers:
+                    self._queue.put(stop_task)
+        if wait:
+            for worker in workers:
+                if worker is not threading.current_thread():
+                    worker.join()
+
+    def _cancel_pending(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not stop_task:
+                item[0].cancel()
+            self._queue.task_done()
+
+    def _adjust_workers(self):
+        # reuse a worker parked in get() before starting another, up to max_workers
+        if self._idle.acquire(timeout=0):
+            return
+        if len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"{self.name}-{len(self._workers)}",
+                                      daemon=self.daemon)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is stop_task:
+                    return
+                future, fn, args, kwargs = item
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+                self._idle.release()
+            finally:
+                self._queue.task_done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every submitted task has been processed."""
+        self._queue.join()
+
+
+class ProcessExecutor(_PoolMixin, Base):
+    """
+    ProcessPoolExecutor with the same bounded submit() as Executor, for CPU-bound
+    targets. fn and its arguments must be picklable (module-level functions).
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, name: str = "process-executor",
+                 initializer: Callable = None, initargs: tuple = ()):
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self.max_queue = self.max_workers * 2 if max_queue is None else max(0, int(max_queue))
+        self.name = name
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=initializer,
+                                         initargs=initargs)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+_executors: Dict[str, Any] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str = "default", process: bool = False, **kwargs) -> Any:
+    """Shared executor by name, created on first use with kwargs."""
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor_class = ProcessExecutor if process else Executor
+            executor = executor_class(name=name, **kwargs)
+            _executors[name] = executor
+    return executor
+
+
+def shutdown_executors(wait: bool = True):
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,230 @@
+import gzip
+import lzma
+import os
+import tarfile
+import zipfile
+from collections import deque
+from contextlib import nullcontext
+from typing import IO, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# in-process archive backend for Ziptask: a tar stream cut into fixed-size blocks,
+# each compressed on its own. xz, gzip and zstd all decode concatenated streams/
+# members/frames as one, so the blocks can be compressed in parallel.
+archive_suffixes = {".tar.xz": "xz", ".txz": "xz", ".tar.gz": "gz", ".tgz": "gz", ".tar.zst": "zst",
+                    ".tar": "tar", ".zip": "zip"}
+format_suffixes = {"xz": ".tar.xz", "gz": ".tar.gz", "zst": ".tar.zst", "tar": ".tar", "zip": ".zip"}
+default_block_size = 8 * 1024 * 1024
+
+
+def load_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("tar.zst archives need zstandard: pip install zstandard")
+    return zstandard
+
+
+def archive_format(path: str) -> Optional[str]:
+    name = path.lower()
+    for suffix, format in archive_suffixes.items():
+        if name.endswith(suffix):
+            return format
+    return None
+
+
+def archive_path(out: str, format: str = "xz") -> str:
+    """out with its archive suffix replaced by the one for format (x.7z -> x.tar.xz)."""
+    current = archive_format(out)
+    if current == format:
+        return out
+    base = out
+    for suffix in list(archive_suffixes) + [".7z"]:
+        if base.lower().endswith(suffix):
+            base = base[:-len(suffix)]
+            break
+    return base + format_suffixes[format]
+
+
+def block_compressor(format: str, level: int = None) -> Optional[Callable[[bytes], bytes]]:
+    if format == "xz":
+        return lambda data: lzma.compress(data, format=lzma.FORMAT_XZ, preset=6 if level is None else level)
+    if format == "gz":
+        return lambda data: gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+    if format == "zst":
+        zstandard = load_zstandard()
+        return lambda data: zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    return None
+
+
+class BlockWriter:
+    """
+    File-like sink that compresses every block_size bytes as an independent
+    stream. With threads > 1 blocks are compressed on an Executor and written
+    back in order; at most 2 * threads blocks are held in memory.
+    """
+
+    def __init__(self, fileobj, compress: Callable[[bytes], bytes], threads: int = 1,
+                 block_size: int = default_block_size):
+        self.fileobj = fileobj
+        self.compress = compress
+        self.threads = max(1, int(threads))
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.executor = None
+        if self.threads > 1:
+            from pycore.thread.executor import Executor
+            self.executor = Executor(max_workers=self.threads, max_queue=self.threads, name="pyarchive")
+
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block: bytes):
+        if self.executor is None:
+            self.fileobj.write(self.compress(block))
+            return
+        self.pending.append(self.executor.submit(self.compress, block))
+        while len(self.pending) > self.threads * 2:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def close(self):
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().result())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        return False
+
+
+def compress(source: str, out: str, format: str = "xz", threads: int = 1, level: int = None,
+             block_size: int = default_block_size) -> Dict[str, int]:
+    """Pack source (a file or directory, stored under its basename) into out."""
+    arcname = os.path.basename(source.rstrip("/\\"))
+    return compress_members(_walk(source, arcname), out, format, threads, level, block_size)
+
+
+def compress_members(members: Iterable[Tuple[str, str]], out: str, format: str = "xz", threads: int = 1,
+                     level: int = None, block_size: int = default_block_size,
+                     dereference: bool = False) -> Dict[str, int]:
+    """
+    Pack (path, arcname) pairs into out; directories are added without their contents.
+    Symlinks are stored as links unless dereference=True (tar only; zip always follows them).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    part_file = f"{out}.part"
+    bytes_in = 0
+    try:
+        if format == "zip":
+            with zipfile.ZipFile(part_file, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+                for path, name in members:
+                    zf.write(path, name)
+                    if os.path.isfile(path):
+                        bytes_in += os.path.getsize(path)
+        else:
+            compressor = block_compressor(format, level)
+            with open(part_file, "wb") as raw:
+                writer = None if compressor is None else BlockWriter(raw, compressor, threads, block_size)
+                with writer or nullcontext():
+                    with tarfile.open(fileobj=writer or raw, mode="w|", dereference=dereference) as tar:
+                        for path, name in members:
+                            tar.add(path, arcname=name, recursive=False)
+                            if os.path.isfile(path) and (dereference or not os.path.islink(path)):
+                                bytes_in += os.path.getsize(path)
+        os.replace(part_file, out)
+    finally:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+    return {"bytes_in": bytes_in, "bytes_out": os.path.getsize(out)}
+
+
+def iter_members(source: str) -> Iterator[Tuple[str, IO[bytes]]]:
+    """(name, reader) for every regular file in the archive, in archive order."""
+    format = archive_format(source)
+    if format == "zip":
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as reader:
+                        yield info.filename, reader
+        return
+    if format == "zst":
+        zstandard = load_zstandard()
+        with open(source, "rb") as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                yield from _tar_files(tar)
+        return
+    with tarfile.open(source, mode="r:*") as tar:
+        yield from _tar_files(tar)
+
+
+def _tar_files(tar: tarfile.TarFile) -> Iterator[Tuple[str, IO[bytes]]]:
+    for member in tar:
+        if member.isfile():
+            yield member.name, tar.extractfile(member)
+
+
+def extract(source: str, out: str) -> Dict[str, int]:
+    """Unpack source into the directory out; bytes_out is the total size of the members."""
+    format = archive_format(source)
+    if format is None:
+        raise ValueError(f"Not an archive the python backend can read: {source}")
+    os.makedirs(out, exist_ok=True)
+    bytes_out = 0
+    if format == "zip":
+        with zipfile.ZipFile(source) as zf:
+            bytes_out = sum(info.file_size for info in zf.infolist())
+            zf.extractall(out)
+    elif format == "zst":
+        zstandard = load_zstandard()
+        with open(source, "rb") as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            bytes_out = _extract_tar(tarfile.open(fileobj=reader, mode="r|"), out)
+    else:
+        # "r:*" reads through LZMAFile/GzipFile, which follow concatenated streams; "r|*" stops at the first
+        bytes_out = _extract_tar(tarfile.open(source, mode="r:*"), out)
+    return {"bytes_in": os.path.getsize(source), "bytes_out": bytes_out}
+
+
+def _extract_tar(tar: tarfile.TarFile, out: str) -> int:
+    total = 0
+    with tar:
+        for member in tar:
+            total += member.size if member.isfile() else 0
+            if hasattr(tarfile, "data_filter"):
+                # refuses absolute paths, links that leave out, and device files
+                tar.extract(member, out, filter="data")
+            else:
+                tar.extract(member, out)
+    return total
+
+
+def _walk(source: str, arcname: str):
+    if not os.path.isdir(source):
+        yield source, arcname
+        return
+    yield source, arcname
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        relative = os.path.relpath(root, source)
+        prefix = arcname if relative == "." else os.path.join(arcname, relative)
+        for name in dirs + sorted(files):
+            yield os.path.join(root, name), os.path.join(prefix, name)
@@ -15,6 +15,7 @@ class SeleniumThread(threading.Thread, Base):  # 继承父类threading.Thread
     __driver = None
     __init_driver_open = True
     args = None
+    browser_pool = None
 
     def __init__(self, target, args, group_queue=None, public_queue=None, thread_id=None,thread_name=None, daemon=True):
         threading.Thread.__init__(self, name=thread_name, daemon=daemon)
@@ -30,8 +31,20 @@ class SeleniumThread(threading.Thread, Base):  # 继承父类threading.Thread
         self.name = thread_name
         self.__send_args = Queue()
         self.__config = config
+        # a BrowserPool: run on a pooled browser instead of launching one for this thread
+        self.browser_pool = user.get("browser_pool") if isinstance(user, dict) else None
 
     def run(self):  # 把要执行的代码写到run函数里面 线程在创建后会直接运行run函数
+        if self.browser_pool is None:
+            return self.run_task()
+        with self.browser_pool.borrow(self):
+            self.__driver = None
+            try:
+                self.run_task()
+            finally:
+                self.__driver = None
+
+    def run_task(self):
         if self.target != None:
             self.target(self.args)
         else:
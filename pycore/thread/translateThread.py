@@ -1,5 +1,6 @@
 from pycore.base.base import Base
 import os
+import queue
 import re
 import time
 import threading
@@ -19,6 +20,7 @@ class TranslateThread(threading.Thread, Base):
     __db = None
     __allow_executeintervalcallback = False
     callback = None
+    browser_pool = None
     __pre_surplus_awaittranswords = 0
 
     def __init__(self, args, group_queue=None, public_queue=None, thread_id=None, thread_name=None, daemon=False):
@@ -44,12 +46,16 @@ class TranslateThread(threading.Thread, Base):
                 self.__debug = args["debug"]
             if "callback" in args:
                 self.callback = args["callback"]
+            # a BrowserPool: lease a pooled browser per item instead of opening one for this thread
+            self.browser_pool = args.get("browser_pool")
         self.thread_name = thread_name
 
     def main(self):
         pass
 
     def run(self):
+        if self.browser_pool is not None:
+            return self.run_pooled()
         url = f'https://www.bing.com/dict?mkt={self.__language}'
         self.com_selenium.open(url, width=600, height=400, mobile=False, not_wait=True, headless=self.__headless,
                                wait=1200000)
@@ -64,14 +70,41 @@ class TranslateThread(threading.Thread, Base):
                 # self.com_util.print_info(
                 #     f"translate Thread {time_now} sleep {thread_normal_sleep} and tick:{self.__tick} 1_update.sh.")
                 time.sleep(thread_normal_sleep)
-            if type(worditem) == str:
-                self.translate_word(worditem)
-            elif type(worditem) == dict:
-                self.update_wordvoice(worditem)
-            elif type(worditem) in [list]:
-                self.trans_tovoice(worditem)
+            self.process_item(worditem)
             self.com_selenium.close_page()
 
+    def run_pooled(self):
+        url = f'https://www.bing.com/dict?mkt={self.__language}'
+        thread_normal_sleep = 60
+        while True:
+            worditem = self.get_itemandupdate()
+            if worditem == None:
+                time.sleep(thread_normal_sleep)
+                continue
+            try:
+                self.process_pooled(worditem, url)
+            except Exception as e:
+                # the pool relaunches the session if its browser died; this thread carries on
+                self.warn(f"translate: {worditem}: {e}")
+
+    def process_pooled(self, worditem, url):
+        with self.browser_pool.borrow(self) as session:
+            # the session keeps its dictionary page open between leases
+            if session.data.get("url") != url:
+                self.com_selenium.open(url, width=600, height=400, mobile=False, not_wait=True,
+                                       headless=self.__headless, wait=1200000)
+                self.com_selenium.find_element_by_js_wait("#sb_form_q")
+                session.data["url"] = url
+            self.process_item(worditem)
+
+    def process_item(self, worditem):
+        if type(worditem) == str:
+            self.translate_word(worditem)
+        elif type(worditem) == dict:
+            self.update_wordvoice(worditem)
+        elif type(worditem) in [list]:
+            self.trans_tovoice(worditem)
+
     def translate_word(self, worditem):
         word = worditem.strip()
         qsize = self.task.qsize()
@@ -125,13 +158,10 @@ class TranslateThread(threading.Thread, Base):
             self.translate_word(word)
 
     def get_item(self):
-        qsize = self.task.qsize()
-        if qsize > 0:
-            self.thread_lock.acquire()
-            item = self.task.get()
-            self.thread_lock.release()
-            return item
-        return None
+        try:
+            return self.task.get_nowait()
+        except queue.Empty:
+            return None
 
     def get_itemandupdate(self):
         thread_message = self.receive_message()
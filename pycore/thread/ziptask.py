@@ -1,84 +1,263 @@
-import errno
+import lzma
 import os
+import re
+import tarfile
 import threading
 import time
 import subprocess
+import zipfile
+from collections import deque
 from pycore.base.base import Base
 from pycore.globalvar.src import src
+from pycore.thread import backup, pyarchive
 from pycore.thread.interface.threadBase import ThreadBase
 from pycore.globalvar.encyclopedia import encyclopedia
 
 thread_name = "ziptask"
+# 7z prints the totals of an extraction as "Size: <bytes>" / "Compressed: <bytes>"
+extract_size_pattern = re.compile(r"^Size:\s+(\d+)\s*$", re.MULTILINE)
+
 
 class Ziptask(threading.Thread, Base, ThreadBase):
-    def __init__(self):
+    """
+    Runs 7z jobs from a shared queue, up to max_jobs processes at once, each with
+    -mmt<threads_per_job>. The dispatcher sleeps on a condition variable and is
+    woken by add_task() and by finishing jobs; it exits once nothing is queued or
+    running, and add_task() starts a new one on demand.
+
+    backend picks 7z (the default) or the in-process pyarchive backend per task.
+    "auto" uses pyarchive when 7z is missing, for sources up to python_threshold
+    bytes (no fork/exec per task), and to extract tar/zip archives. pyarchive
+    writes .tar.<python_format> instead of .7z; add_task() returns the path the
+    task writes and logs the switch. add_task(...,
+    incremental=True) keeps a manifest next to the archive and packs only new
+    content into delta archives; extracting with incremental=True rebuilds a snapshot.
+    """
+
+    def __init__(self, max_jobs=None, threads_per_job=2, backend="7z", python_threshold=64 * 1024 * 1024,
+                 python_format="xz"):
         super().__init__()
         self.tasks_as_group = {}
-        self.max_tasks = 10
+        self.group_callbacks = {}
+        self.threads_per_job = max(1, int(threads_per_job))
+        self.max_jobs = max(1, int(max_jobs or (os.cpu_count() or 1) // self.threads_per_job))
+        self.backend = backend
+        self.python_threshold = python_threshold
+        self.python_format = python_format
+        self._has_7z = None
+        self._archive_locks = {}
         self._stop_event = threading.Event()
         self._is_running = threading.Event()
+        self._condition = threading.Condition()
+        self._pending = deque()
+        self._dispatcher = None
         self.thread_name = thread_name
         self.callbacks = {}
         self.concurrent_tasks = 0
         self.executed_tasks_count = 0
+        self.reports = deque(maxlen=1000)
 
     def stop(self):
-        self._stop_event.set()
-        self._is_running.clear()
+        """Stop dispatching; jobs already running finish, queued ones are dropped."""
+        with self._condition:
+            self._stop_event.set()
+            self._pending.clear()
+            self.tasks_as_group.clear()
+            self.group_callbacks.clear()
+            self._condition.notify_all()
 
     def run(self):
-        self._is_running.set()  # Set running state
-        while not self._stop_event.is_set():
-            if not self.start_task():
-                self.stop()  # Stop the thread if there are no tasks
-            time.sleep(1)  # Sleep for 1 second to avoid high CPU usage
-        self._is_running.clear()  # Clear running state when exiting
+        self._is_running.set()
+        try:
+            while True:
+                with self._condition:
+                    while not self._stop_event.is_set() and (
+                            not self._pending or self.concurrent_tasks >= self.max_jobs):
+                        if not self._pending and self.concurrent_tasks == 0:
+                            break
+                        self._condition.wait()
+                    if self._stop_event.is_set() or not self._pending:
+                        self._dispatcher = None
+                        self._is_running.clear()
+                        self._condition.notify_all()
+                        return
+                    task = self._pending.popleft()
+                    self.concurrent_tasks += 1
+                threading.Thread(target=self.execute_single_task, args=(task,),
+                                 name=f"{thread_name}-job").start()
+        except BaseException:
+            with self._condition:
+                self._dispatcher = None
+                self._is_running.clear()
+            raise
 
     def start_task(self):
-        if self.tasks_as_group:
-            for group_name, task_group in list(self.tasks_as_group.items()):
-                if task_group:
-                    self.execute_task_group(task_group)
-                    del self.tasks_as_group[group_name]
-                    return True
-        return False  # No tasks to process, signal to stop the thread
-
-    def execute_task_group(self, task_group):
-        for task in task_group:
-            self.execute_single_task(task)
-        # Execute group callback after all tasks in the group are done
-        group_callback = task_group[0]['group_callback']
-        if group_callback:
-            group_callback()
+        with self._condition:
+            # new work after stop(): a dispatcher that has not exited yet must keep going
+            self._stop_event.clear()
+            if self._dispatcher is None:
+                self._is_running.set()
+                self._dispatcher = threading.Thread(target=self.run, name=thread_name)
+                self._dispatcher.start()
+            self._condition.notify_all()
+        return True
+
+    def wait(self, timeout=None):
+        """Block until every queued and running job has finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self.concurrent_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
 
     def execute_single_task(self, task):
-        command = task['command']
-        callback = task['callback']
-        print_log = task['print_log']
-        start_time = time.time()
-        self.exec_cmd(command)
-        if callback:
-            callback(int((time.time() - start_time) * 1000))
-
-    def add_task(self, src, out=None, group_name="default", is_compress=False, callback=None, group_callback=None, print_log=True):
+        report = {"group_name": task['group_name'], "src": task['src'], "out": task['out'],
+                  "is_compress": task['is_compress'], "backend": task['backend'], "ok": False}
+        try:
+            start_time = time.time()
+            if task['backend'] == "incremental":
+                result = self.exec_incremental(task)
+            elif task['backend'] == "python":
+                result = self.exec_python(task)
+            else:
+                result = self.exec_cmd(task['command'])
+            report["duration_ms"] = int((time.time() - start_time) * 1000)
+            report["ok"] = result is not None
+            report.update(self.measure(task, result) if report["ok"] else
+                          {"bytes_in": None, "bytes_out": None, "ratio": None})
+            self.log(self.format_report(report), task['print_log'])
+        except Exception as e:
+            self.log(f'Error executing task {task["src"]}: {e}', True)
+        # callbacks run before the job counts as done, so wait() returns only after them
+        try:
+            self.reports.append(report)
+            self.run_callback(task, task['callback'], report.get("duration_ms", 0))
+            self.run_callback(task, task['on_report'], report)
+            # Execute group callback after all tasks in the group are done
+            self.run_callback(task, self.leave_group(task))
+        finally:
+            self.task_done()
+
+    def run_callback(self, task, callback, *args):
+        if not callback:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            self.log(f'Error in callback of task {task["src"]}: {e}', True)
+
+    def leave_group(self, task):
+        """Remove task from its group; returns the group callback once the group is empty."""
+        with self._condition:
+            group = self.tasks_as_group.get(task['group_name'])
+            if group is None or task not in group:
+                return None
+            group.remove(task)
+            if group:
+                return None
+            del self.tasks_as_group[task['group_name']]
+            return self.group_callbacks.pop(task['group_name'], None)
+
+    def task_done(self):
+        with self._condition:
+            self.concurrent_tasks -= 1
+            self.executed_tasks_count += 1
+            self._condition.notify_all()
+
+    def measure(self, task, result):
+        if task['backend'] in ("python", "incremental"):
+            bytes_in, bytes_out = result["bytes_in"], result["bytes_out"]
+            original, compressed = (bytes_in, bytes_out) if task['is_compress'] else (bytes_out, bytes_in)
+        elif task['is_compress']:
+            bytes_in = self.path_size(task['src'])
+            bytes_out = self.path_size(task['out'])
+            original, compressed = bytes_in, bytes_out
+        else:
+            bytes_in = self.path_size(task['src'])
+            # the output directory may hold other files, so take 7z's own total
+            match = extract_size_pattern.search(result.stdout or "") if result is not None else None
+            bytes_out = int(match.group(1)) if match else None
+            original, compressed = bytes_out, bytes_in
+        ratio = round(compressed / original, 4) if original and compressed is not None else None
+        return {"bytes_in": bytes_in, "bytes_out": bytes_out, "ratio": ratio}
+
+    def path_size(self, path):
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        total = 0
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def format_report(self, report):
+        action = "compress" if report["is_compress"] else "extract"
+        ratio = f'{report["ratio"] * 100:.1f}%' if report.get("ratio") is not None else "-"
+        if not report["ok"]:
+            return f'{action} {report["src"]} -> {report["out"]}: failed after {report["duration_ms"]}ms'
+        return (f'{action} {report["src"]} -> {report["out"]}: {report["duration_ms"]}ms, '
+                f'in {report["bytes_in"]} bytes, out {report["bytes_out"]} bytes, ratio {ratio}')
+
+    def add_task(self, src, out=None, group_name="default", is_compress=False, callback=None, group_callback=None,
+                 print_log=True, on_report=None, backend=None, incremental=False, snapshot=None):
         src_new, out_new = self.generate_zip_dir(src, out, is_compress)
-        command = self.create_command(src_new, out_new, is_compress)
+        backend = "incremental" if incremental else self.choose_backend(src_new, is_compress,
+                                                                         backend or self.backend)
+        if backend in ("python", "incremental"):
+            command = None
+            if is_compress:
+                requested = out_new
+                out_new = pyarchive.archive_path(out_new, self.python_format)
+                if out_new != requested:
+                    self.log(f'{backend} backend: writing {out_new} instead of {requested}', True)
+        else:
+            command = self.create_command(src_new, out_new, is_compress)
         task = {
             'command': command,
             'src': src_new,
             'out': out_new,
+            'is_compress': is_compress,
+            'backend': backend,
+            'snapshot': snapshot,
+            'group_name': group_name,
             'callback': callback,
             'group_callback': group_callback,
+            'on_report': on_report,
             'print_log': print_log
         }
-        print(task)
+        self.log(task, print_log)
 
-        if group_name not in self.tasks_as_group:
-            self.tasks_as_group[group_name] = []
-        self.tasks_as_group[group_name].append(task)
+        with self._condition:
+            if group_name not in self.tasks_as_group:
+                self.tasks_as_group[group_name] = []
+            self.tasks_as_group[group_name].append(task)
+            # one callback per group: the first one passed for it, whichever task finishes last
+            if group_callback and not self.group_callbacks.get(group_name):
+                self.group_callbacks[group_name] = group_callback
+            self._pending.append(task)
+        self.start_task()
+        return out_new
 
-        if not self.is_running():
-            self.start()  # Use start() to run the thread
+    def choose_backend(self, source, is_compress, backend="auto"):
+        if backend != "auto":
+            return backend
+        if not is_compress:
+            return "python" if pyarchive.archive_format(source) is not None else "7z"
+        if not self.has_7z() or self.path_size(source) <= self.python_threshold:
+            return "python"
+        return "7z"
+
+    def has_7z(self):
+        if self._has_7z is None:
+            executable = src.get_7z_executable()
+            self._has_7z = bool(executable) and os.path.isfile(executable)
+        return self._has_7z
 
     def log(self, message, print_log):
         if print_log:
@@ -105,17 +284,54 @@ class Ziptask(threading.Thread, Base, ThreadBase):
         return src_new, out_new
 
     def create_command(self, source, output, is_compress=True):
+        # an argument list, so paths need no shell quoting
+        executable = src.get_7z_executable()
+        threads = f'-mmt{self.threads_per_job}'
         if is_compress:
-            command = f'"{src.get_7z_executable()}" a "{output}" "{source}"'
+            command = [executable, 'a', threads, output, source]
         else:
-            command = f'"{src.get_7z_executable()}" x "{source}" -o"{output}" -y'
+            command = [executable, 'x', threads, source, f'-o{output}', '-y']
         return command
 
     def exec_cmd(self, command):
         try:
-            subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError as e:
+            return subprocess.run(command, shell=isinstance(command, str), check=True, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, text=True, errors="replace")
+        except (subprocess.CalledProcessError, OSError) as e:
             self.log(f'Error executing command: {str(e)}', True)
+            return None
+
+    def exec_python(self, task):
+        try:
+            if task['is_compress']:
+                return pyarchive.compress(task['src'], task['out'], self.python_format,
+                                          threads=self.threads_per_job)
+            return pyarchive.extract(task['src'], task['out'])
+        except (OSError, ValueError, EOFError, ImportError, tarfile.TarError, zipfile.BadZipFile,
+                lzma.LZMAError) as e:
+            self.log(f'Error in python archive backend: {str(e)}', True)
+            return None
+
+    def exec_incremental(self, task):
+        try:
+            if task['is_compress']:
+                # two backups into the same archive must not interleave their manifest updates
+                with self._condition:
+                    lock = self._archive_locks.setdefault(os.path.abspath(task['out']), threading.Lock())
+                with lock:
+                    result = backup.backup(task['src'], task['out'], self.python_format,
+                                           threads=self.threads_per_job)
+                self.log(f'snapshot {result["snapshot"]}: {result["changed"]} changed, {result["packed"]} packed, '
+                         f'{result["deleted"]} deleted of {result["files"]} files', task['print_log'])
+                if result["skipped"]:
+                    self.log(f'snapshot {result["snapshot"]}: skipped unreadable entries (dangling links?): '
+                             f'{", ".join(result["skipped"])}', True)
+                return result
+            return backup.restore(task['src'], task['out'], task['snapshot'])
+        except (OSError, ValueError, KeyError, EOFError, ImportError, tarfile.TarError, zipfile.BadZipFile,
+                lzma.LZMAError) as e:
+            self.log(f'Error in incremental backup: {str(e)}', True)
+            return None
 
     def is_running(self):
         return self._is_running.is_set()  # Return the running state
@@ -5,5 +5,9 @@ from pycore.thread.comThread import ComThread
 FlaskThread = FlaskThread
 ComThread = ComThread
 
+from pycore.thread.executor import Executor, ProcessExecutor, get_executor, stop_task
+Executor = Executor
+ProcessExecutor = ProcessExecutor
+
 from pycore.thread.ziptask import Ziptask
 ziptask = Ziptask()
\ No newline at end of file